@@ -0,0 +1,184 @@
+import random
+from collections import deque
+from typing import NamedTuple
+
+from engine import DIRECTIONS, OPPOSITES
+
+MAX_PLAYERS = 255  # player ids fit in a byte, 0 marks free cells
+SPAWN_LENGTH = 3
+RESPAWN_TICKS = 20  # ticks a dead snake waits before it is put back on the board
+
+
+class Event(NamedTuple):
+    """Change of the arena in a step. Clients rebuild the arena from these instead of full states.
+     Only the fields of the event kind are used. A tail event frees the tail cell of a snake, the tail events
+     of a step come before its moves."""
+    kind: str  # "tail", "move", "die", "spawn", "leave", "food_add" or "food_remove"
+    player: int = 0
+    cell: tuple[int, int] = (0, 0)  # new head of a move, food cell of food events
+    flags: int = 0  # of a move
+    cells: tuple[tuple[int, int], ...] = ()  # body of a spawn, head first
+    direction: str = "right"  # of a spawn
+
+
+MOVE_GREW = 1  # move flag: the tail stayed in place
+MOVE_ATE = 2  # move flag: the snake ate, its score went up by one
+
+
+class ArenaSnake:
+    """A snake of one player in the arena."""
+
+    def __init__(self, player: int) -> None:
+        self.player = player
+        self.body: deque[tuple[int, int]] = deque()  # head first, empty while the snake is dead
+        self.direction = "right"
+        self.last_moved = "right"  # direction of the last step, used to prevent u-turns into the neck
+        self.pending_growth = 0
+        self.score = 0
+        self.alive = False
+        self.respawn_tick = 0  # tick the snake is put back on the board on while it is dead
+
+
+class ArenaEngine:
+    """Class containing the rules of a board shared by several snakes, without any pygame dependency.
+     Snakes that hit any snake die and are put back on the board after a while. Two heads moving into the
+     same cell kill both snakes. Every step returns the events that changed the arena."""
+
+    def __init__(self,
+                 grid_size: tuple[int, int],
+                 food_count: int = 3,
+                 seed: int | None = None) -> None:
+        if grid_size[0] < 8 or grid_size[1] < 8:
+            raise ValueError("Grid size must be at least 8x8 tiles.")
+        self.grid_size = grid_size
+        self.food_count = food_count
+        self.rng = random.Random(seed)
+        self.owners = bytearray(grid_size[0] * grid_size[1])  # player id covering each cell by row, 0 if free
+        self.snakes: dict[int, ArenaSnake] = {}
+        self.food: set[tuple[int, int]] = set()
+        self.frame = 0  # number of steps done
+        self._events: list[Event] = []  # events made between steps, sent with the next step
+        self._spawn_food()
+
+    def add_player(self) -> int:
+        """Adds a player and returns its id. The snake of the player appears on the next step."""
+        player = next((i for i in range(1, MAX_PLAYERS + 1) if i not in self.snakes), None)
+        if player is None:
+            raise ValueError(f"The arena is full, it has room for {MAX_PLAYERS} players.")
+        snake = ArenaSnake(player)
+        snake.respawn_tick = self.frame + 1
+        self.snakes[player] = snake
+        return player
+
+    def remove_player(self, player: int) -> None:
+        """Removes a player and its snake from the board."""
+        if (snake := self.snakes.pop(player, None)) is None:
+            return
+        self._clear(snake)
+        self._events.append(Event("leave", player))
+
+    def turn(self, player: int, direction: str) -> None:
+        """Turns the snake of a player in a given direction. Prevents the snake from doing a u-turn."""
+        if direction not in DIRECTIONS:
+            raise ValueError(f"Invalid direction: '{direction}'.")
+        snake = self.snakes[player]
+        if direction != OPPOSITES[snake.last_moved]:
+            snake.direction = direction
+
+    def step(self) -> list[Event]:
+        """Advances the arena by one tick and returns the events of the tick, and the events
+         since the last step, in the order clients must apply them."""
+        cols, rows = self.grid_size
+        self.frame += 1
+        events, self._events = self._events, []
+        moving = [snake for snake in self.snakes.values() if snake.alive]
+        heads = {}
+        for snake in moving:
+            dx, dy = DIRECTIONS[snake.direction]
+            x, y = snake.body[0]
+            heads[snake.player] = (x + dx) % cols, (y + dy) % rows
+            snake.last_moved = snake.direction
+        # tails leave their cells before the heads enter new ones, also the tails of snakes that die in this step,
+        # so clients free the same cells before placing the heads
+        flags = {}
+        for snake in moving:
+            if heads[snake.player] in self.food:
+                flags[snake.player] = MOVE_GREW | MOVE_ATE
+            elif snake.pending_growth:
+                snake.pending_growth -= 1
+                flags[snake.player] = MOVE_GREW
+            else:
+                tail_x, tail_y = snake.body.pop()
+                self.owners[tail_y * cols + tail_x] = 0
+                flags[snake.player] = 0
+                events.append(Event("tail", snake.player))
+        head_counts: dict[tuple[int, int], int] = {}
+        for head in heads.values():
+            head_counts[head] = head_counts.get(head, 0) + 1
+        dead = [snake for snake in moving if head_counts[heads[snake.player]] > 1
+                or self.owners[heads[snake.player][1] * cols + heads[snake.player][0]]]
+        dead_players = {snake.player for snake in dead}
+        for snake in moving:
+            if snake.player in dead_players:
+                continue
+            head = heads[snake.player]
+            snake.body.appendleft(head)
+            self.owners[head[1] * cols + head[0]] = snake.player
+            if flags[snake.player] & MOVE_ATE:
+                snake.score += 1
+                self.food.discard(head)
+                events.append(Event("food_remove", cell=head))
+            events.append(Event("move", snake.player, head, flags[snake.player]))
+        for snake in dead:
+            self._clear(snake)
+            snake.respawn_tick = self.frame + RESPAWN_TICKS
+            events.append(Event("die", snake.player))
+
+        for snake in self.snakes.values():
+            if not snake.alive and snake.respawn_tick <= self.frame and self._spawn(snake):
+                events.append(Event("spawn", snake.player, cells=tuple(snake.body), direction=snake.direction))
+        events += self._spawn_food()
+        return events
+
+    def _clear(self, snake: ArenaSnake) -> None:
+        """Removes a snake from the board."""
+        cols = self.grid_size[0]
+        for x, y in snake.body:
+            self.owners[y * cols + x] = 0
+        snake.body.clear()
+        snake.alive = False
+
+    def _spawn(self, snake: ArenaSnake, tries: int = 100) -> bool:
+        """Puts a dead snake back on the board, facing right in a row with free cells ahead of it.
+         Returns False if no place was found, the snake then tries again on the next step."""
+        cols, rows = self.grid_size
+        room = SPAWN_LENGTH + 3  # free cells the snake needs, including the ones ahead of its head
+        for _ in range(tries):
+            x, y = self.rng.randrange(cols), self.rng.randrange(rows)
+            cells = [((x + i) % cols, y) for i in range(room)]
+            if any(self.owners[cell_y * cols + cell_x] or (cell_x, cell_y) in self.food for cell_x, cell_y in cells):
+                continue
+            snake.body = deque(reversed(cells[:SPAWN_LENGTH]))
+            for cell_x, cell_y in snake.body:
+                self.owners[cell_y * cols + cell_x] = snake.player
+            snake.direction = snake.last_moved = "right"
+            snake.pending_growth = 0
+            snake.score = 0
+            snake.alive = True
+            return True
+        return False
+
+    def _spawn_food(self, tries: int = 100) -> list[Event]:
+        """Adds food on random free cells until there are food_count of them. Returns their events."""
+        cols, rows = self.grid_size
+        events = []
+        while len(self.food) < self.food_count:
+            for _ in range(tries):
+                cell = self.rng.randrange(cols), self.rng.randrange(rows)
+                if not self.owners[cell[1] * cols + cell[0]] and cell not in self.food:
+                    break
+            else:
+                return events  # the board is too full, try again on the next step
+            self.food.add(cell)
+            events.append(Event("food_add", cell=cell))
+        return events
@@ -0,0 +1,126 @@
+import logging
+
+import pygame as pg
+
+from atlas import Atlas
+from tools import get_resource_path
+
+# Counter-clockwise rotation in degrees of an image facing right to face each direction
+ROTATIONS = {"right": 0, "up": 90, "left": 180, "down": -90}
+MAX_CACHED_TEXTS = 512  # the oldest rendered texts are dropped when there are more
+
+
+class AssetRegistry:
+    """Class that decodes every asset once and hands out shared surfaces.
+     Sprites must not draw on the shared surfaces, only blit or transform them into new ones."""
+
+    def __init__(self) -> None:
+        # maps (relative path, size, alpha) to the decoded and scaled image surface
+        self._images: dict[tuple[str, tuple[int, int] | None, bool], pg.surface.Surface] = {}
+        # maps (relative path, size) to the image rotated to face each direction
+        self._orientations: dict[tuple[str, tuple[int, int] | None], dict[str, pg.surface.Surface]] = {}
+        # maps (relative path, size) to the opened font
+        self._fonts: dict[tuple[str, int], pg.font.Font] = {}
+        # maps (relative font path, size, text, color) to the rendered text
+        self._texts: dict[tuple[str, int, str, str | tuple[int, int, int]], pg.surface.Surface] = {}
+        # maps the relative path of an atlas index to the loaded atlas
+        self._atlases: dict[str, Atlas] = {}
+
+    def image(self,
+              relative_path: str,
+              size: tuple[int, int] | None = None,
+              alpha: bool = True) -> pg.surface.Surface:
+        """Returns the shared surface of an image in the assets/images folder, scaled to the given size.
+         The image is only read from disk the first time it is requested."""
+        key = relative_path, size, alpha
+        if (surface := self._images.get(key)) is None:
+            logging.debug(f"Loading image '{relative_path}' with size {size}.")
+            surface = self._load_image(relative_path, size, alpha)
+            self._images[key] = surface
+        return surface
+
+    def orientations(self,
+                     relative_path: str,
+                     size: tuple[int, int] | None = None) -> dict[str, pg.surface.Surface]:
+        """Returns the shared surfaces of an image facing right, rotated once to face every direction.
+         Each rotation is made from the original image, so turning never resamples a rotated image."""
+        key = relative_path, size
+        if (orientations := self._orientations.get(key)) is None:
+            image = self.image(relative_path, size)
+            orientations = {direction: pg.transform.rotate(image, degrees) if degrees else image
+                            for direction, degrees in ROTATIONS.items()}
+            self._orientations[key] = orientations
+        return orientations
+
+    def atlas(self, relative_path: str, use_mmap: bool = False) -> Atlas:
+        """Returns the shared atlas with the given index file in the assets/images folder, for example
+         'fruit_atlas.json'. The atlas is only loaded the first time it is requested."""
+        if (atlas := self._atlases.get(relative_path)) is None:
+            logging.debug(f"Loading atlas '{relative_path}'.")
+            atlas = Atlas(get_resource_path(f"../assets/images/{relative_path}"), use_mmap)
+            self._atlases[relative_path] = atlas
+        return atlas
+
+    def font(self, relative_path: str, size: int) -> pg.font.Font:
+        """Returns the shared font in the assets/fonts folder with the given size.
+         The font file is only opened the first time it is requested."""
+        key = relative_path, size
+        if (font := self._fonts.get(key)) is None:
+            font = pg.font.Font(get_resource_path(f"../assets/fonts/{relative_path}"), size)
+            self._fonts[key] = font
+        return font
+
+    def text(self,
+             relative_path: str,
+             size: int,
+             text: str,
+             color: str | tuple[int, int, int]) -> pg.surface.Surface:
+        """Returns the shared surface of an anti-aliased text rendered with the given font.
+         Each text is only rendered the first time it is requested."""
+        key = relative_path, size, text, color
+        if (surface := self._texts.get(key)) is None:
+            surface = self.font(relative_path, size).render(text, True, color)
+            if len(self._texts) >= MAX_CACHED_TEXTS:
+                del self._texts[next(iter(self._texts))]  # dicts keep insertion order, so this is the oldest
+            self._texts[key] = surface
+        return surface
+
+    def preload(self,
+                images: list[tuple[str, tuple[int, int] | None, bool]],
+                oriented_images: list[tuple[str, tuple[int, int] | None]] = ()) -> None:
+        """Decodes the given (relative path, size, alpha) images and rotates the (relative path, size)
+         oriented images up front, so that no disk reads or rotations happen during the game.
+         Converts the images to the display format if the display mode is set."""
+        for relative_path, size, alpha in images:
+            self.image(relative_path, size, alpha)
+        for relative_path, size in oriented_images:
+            self.orientations(relative_path, size)
+        logging.info(f"Preloaded {len(self._images)} images ({self.memory_usage() // 1024} kB).")
+
+    def memory_usage(self) -> int:
+        """Returns the number of bytes used by the pixels of the cached images."""
+        surfaces = [*self._images.values()]
+        surfaces += [surface for orientations in self._orientations.values()
+                     for direction, surface in orientations.items() if ROTATIONS[direction]]
+        return sum(surface.get_bytesize() * surface.get_width() * surface.get_height() for surface in surfaces)
+
+    def clear(self) -> None:
+        """Removes all cached images, atlases, fonts and texts."""
+        self._images.clear()
+        self._atlases.clear()
+        self._orientations.clear()
+        self._fonts.clear()
+        self._texts.clear()
+
+    @staticmethod
+    def _load_image(relative_path: str, size: tuple[int, int] | None, alpha: bool) -> pg.surface.Surface:
+        """Loads an image from disk, scales it and converts it to the display format when possible."""
+        surface = pg.image.load(get_resource_path(f"../assets/images/{relative_path}"))
+        if size is not None and surface.get_size() != size:
+            surface = pg.transform.scale(surface, size)
+        if pg.display.get_surface() is not None:  # converting needs a display mode
+            surface = surface.convert_alpha() if alpha else surface.convert()
+        return surface
+
+
+registry = AssetRegistry()
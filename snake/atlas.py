@@ -0,0 +1,129 @@
+import argparse
+import glob
+import json
+import logging
+import mmap
+import os
+
+import pygame as pg
+
+# An atlas is an image with many sprites packed into it and an index file with the rect of each sprite by name.
+# The raw file next to them holds the same pixels as the image, uncompressed, so they can be memory mapped.
+INDEX_VERSION = 1
+RAW_FORMAT = "RGBA"
+
+
+def _shelf_pack(sizes: dict[str, tuple[int, int]], width: int, padding: int) -> tuple[dict[str, pg.Rect], int]:
+    """Places the sprites in rows from the tallest to the shortest and returns their rects and the height used."""
+    rects = {}
+    x = y = shelf_height = 0
+    for name in sorted(sizes, key=lambda name: (-sizes[name][1], name)):
+        w, h = sizes[name]
+        if x and x + w > width:  # start a new row
+            x, y = 0, y + shelf_height + padding
+            shelf_height = 0
+        rects[name] = pg.Rect(x, y, w, h)
+        x += w + padding
+        shelf_height = max(shelf_height, h)
+    return rects, y + shelf_height
+
+
+def pack_atlas(image_paths: list[str], output_path: str, padding: int = 0, raw: bool = True) -> dict:
+    """Packs images into one atlas image and writes it with its index, named after the images without their
+     extension. Writes the raw pixels for memory mapping as well if raw is True. Returns the index."""
+    images = {os.path.splitext(os.path.basename(path))[0]: pg.image.load(path) for path in sorted(image_paths)}
+    if len(images) != len(image_paths):
+        raise ValueError("Image names must be unique.")
+    sizes = {name: image.get_size() for name, image in images.items()}
+    area = sum((w + padding) * (h + padding) for w, h in sizes.values())
+    # the narrowest power of two at least as wide as the widest image that gives a roughly square atlas
+    width = 1
+    while width < max(w for w, _ in sizes.values()) or width * width < area:
+        width *= 2
+    rects, height = _shelf_pack(sizes, width, padding)
+
+    atlas = pg.Surface((width, height), pg.SRCALPHA)
+    for name, image in images.items():
+        atlas.blit(image, rects[name])
+    base = os.path.splitext(output_path)[0]
+    pg.image.save(atlas, f"{base}.png")
+    index = {
+        "version": INDEX_VERSION,
+        "image": os.path.basename(f"{base}.png"),
+        "raw": os.path.basename(f"{base}.rgba") if raw else None,
+        "size": [width, height],
+        "sprites": {name: [*rects[name]] for name in sorted(rects)},
+    }
+    if raw:
+        with open(f"{base}.rgba", "wb") as f:
+            f.write(pg.image.tobytes(atlas, RAW_FORMAT))
+    with open(f"{base}.json", "w") as f:
+        json.dump(index, f, separators=(",", ":"))
+    return index
+
+
+class Atlas:
+    """Class that loads an atlas once and hands out its sprites as shared subsurfaces of it.
+     Loading costs one file read however many sprites the atlas holds. With use_mmap, the pixels are mapped
+     from the raw file instead of decoded from the image, so only the pages of the sprites drawn are read."""
+
+    def __init__(self, index_path: str, use_mmap: bool = False) -> None:
+        with open(index_path) as f:
+            index = json.load(f)
+        if index.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported atlas index version: {index.get('version')}.")
+        folder = os.path.dirname(index_path)
+        size = tuple(index["size"])
+        self.rects = {name: pg.Rect(rect) for name, rect in index["sprites"].items()}
+        self._mmap: mmap.mmap | None = None
+        raw_path = os.path.join(folder, index["raw"]) if index.get("raw") else None
+        if use_mmap and raw_path is not None and os.path.isfile(raw_path):
+            with open(raw_path, "rb") as f:
+                # copy on write, the surface needs a writable buffer but the file is never changed
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+            # the surface uses the mapped pixels without copying them, so it is not converted
+            self.surface = pg.image.frombuffer(self._mmap, size, RAW_FORMAT)
+        else:
+            self.surface = pg.image.load(os.path.join(folder, index["image"]))
+            if pg.display.get_surface() is not None:  # converting needs a display mode
+                self.surface = self.surface.convert_alpha()
+        self._sprites: dict[str, pg.surface.Surface] = {}
+
+    def __len__(self) -> int:
+        return len(self.rects)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.rects
+
+    def names(self) -> list[str]:
+        return sorted(self.rects)
+
+    def sprite(self, name: str) -> pg.surface.Surface:
+        """Returns the shared subsurface of a sprite. It shares its pixels with the atlas, so it must not be
+         drawn on."""
+        if (sprite := self._sprites.get(name)) is None:
+            if name not in self.rects:
+                raise KeyError(f"No sprite named '{name}' in the atlas.")
+            sprite = self._sprites[name] = self.surface.subsurface(self.rects[name])
+        return sprite
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Packs images into an atlas image with an index of their rects.")
+    parser.add_argument("images", nargs="+", help="images, or glob patterns of images, to pack")
+    parser.add_argument("--output", required=True,
+                        help="path of the atlas without extension, the .png, .json and .rgba files are written")
+    parser.add_argument("--padding", type=int, default=0, help="pixels between the sprites")
+    parser.add_argument("--no-raw", action="store_true", help="do not write the raw pixels for memory mapping")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    paths = sorted({path for pattern in args.images for path in glob.glob(pattern)})
+    if not paths:
+        parser.error("No images found.")
+    index = pack_atlas(paths, args.output, args.padding, raw=not args.no_raw)
+    logging.info(f"Packed {len(index['sprites'])} images into a {index['size'][0]}x{index['size'][1]} atlas.")
+
+
+if __name__ == '__main__':
+    main()
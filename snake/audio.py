@@ -0,0 +1,118 @@
+import logging
+import os
+
+import pygame as pg
+
+from tools import get_resource_path
+
+# Mixer settings, a small buffer keeps the delay between an event and its sound short
+FREQUENCY = 44100
+SAMPLE_SIZE = -16  # signed 16 bit samples
+CHANNELS = 2  # stereo
+BUFFER_SIZE = 512  # samples per mix, about 12 ms at 44.1 kHz
+
+SOUNDS = [  # sound effects decoded up front, so no sound is read from disk during the game
+    "eat.wav",
+    "death.wav",
+    "Arcade Retro Game Over Sound Effect💤 sounds.wav",
+]
+
+
+def init() -> bool:
+    """Initializes the mixer with the mixer settings. Returns False if there is no sound device."""
+    try:
+        pg.mixer.init(FREQUENCY, SAMPLE_SIZE, CHANNELS, BUFFER_SIZE)
+    except pg.error as e:
+        logging.warning(f"Could not initialize the mixer: {e}")
+        return False
+    return True
+
+
+class Audio:
+    """Class that plays the sound effects and the background music.
+     Sound effects are decoded once and played on a pool of reserved channels, so they never wait for
+     disk reads and are not cut off by other sounds. The music is streamed from disk by the mixer while it
+     plays, so the track is never decoded into memory as a whole. Without a sound device nothing is played."""
+
+    def __init__(self, sound_volume: float = 0.5, music_volume: float = 0.15, pool_size: int = 8) -> None:
+        self.sound_volume = sound_volume
+        self.music_volume = music_volume
+        self.enabled = pg.mixer.get_init() is not None
+        self._sounds: dict[str, pg.mixer.Sound | None] = {}  # decoded sounds, None if the file is missing
+        self._channels: list[pg.mixer.Channel] = []
+        self._next_channel = 0  # channel of the pool the next sound cuts off when all of them are busy
+        self._music_loaded = False
+        if not self.enabled:
+            logging.warning("No sound device, the game is silent.")
+            return
+        # the reserved channels are never picked by pygame for other sounds
+        pg.mixer.set_num_channels(max(pg.mixer.get_num_channels(), pool_size))
+        pg.mixer.set_reserved(pool_size)
+        self._channels = [pg.mixer.Channel(i) for i in range(pool_size)]
+
+    def preload(self, relative_paths: list[str]) -> None:
+        """Decodes the given sounds in the assets/sounds folder up front."""
+        for relative_path in relative_paths:
+            self.sound(relative_path)
+        if self.enabled:
+            logging.info(f"Preloaded {len(self._sounds)} sounds ({self.memory_usage() // 1024} kB).")
+
+    def sound(self, relative_path: str) -> pg.mixer.Sound | None:
+        """Returns the shared decoded sound of a file in the assets/sounds folder, or None if it is missing.
+         The file is only read from disk the first time it is requested."""
+        if relative_path not in self._sounds:
+            sound = None
+            if self.enabled:
+                try:
+                    sound = pg.mixer.Sound(get_resource_path(f"../assets/sounds/{relative_path}"))
+                except (pg.error, FileNotFoundError) as e:
+                    logging.warning(f"Could not load sound '{relative_path}': {e}")
+            self._sounds[relative_path] = sound
+        return self._sounds[relative_path]
+
+    def play(self, relative_path: str, volume: float | None = None) -> None:
+        """Plays a sound effect on a free channel of the pool, or on the one that started playing the
+         longest ago if all of them are busy. The volume defaults to the sound volume."""
+        if (sound := self.sound(relative_path)) is None:
+            return
+        channel = next((channel for channel in self._channels if not channel.get_busy()), None)
+        if channel is None:
+            channel = self._channels[self._next_channel]
+            self._next_channel = (self._next_channel + 1) % len(self._channels)
+        # the volume is set on the channel, the shared sound keeps its own volume
+        channel.set_volume(max(0.0, self.sound_volume if volume is None else volume))
+        channel.play(sound)
+
+    def load_music(self, relative_path: str) -> None:
+        """Opens the background music in the assets/sounds folder for streaming. Only a small part of the file
+         is decoded at a time while it plays."""
+        if not self.enabled:
+            return
+        path = get_resource_path(f"../assets/sounds/{relative_path}")
+        if not os.path.isfile(path):
+            logging.warning(f"Music '{relative_path}' not found, playing without music.")
+            return
+        try:
+            pg.mixer.music.load(path)
+        except pg.error as e:
+            logging.warning(f"Could not load music '{relative_path}': {e}")
+            return
+        pg.mixer.music.set_volume(self.music_volume)
+        self._music_loaded = True
+
+    def play_music(self) -> None:
+        """Plays the background music from the start in a loop."""
+        if self._music_loaded:
+            pg.mixer.music.play(-1)
+
+    def stop_music(self) -> None:
+        if self._music_loaded:
+            pg.mixer.music.stop()
+
+    def memory_usage(self) -> int:
+        """Returns the number of bytes used by the decoded sounds."""
+        if not self.enabled:
+            return 0
+        frequency, sample_size, channels = pg.mixer.get_init()  # sounds are decoded to the mixer format
+        return sum(round(sound.get_length() * frequency) * channels * (abs(sample_size) // 8)
+                   for sound in self._sounds.values() if sound is not None)
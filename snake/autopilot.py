@@ -0,0 +1,203 @@
+import time
+from array import array
+from collections import deque
+
+from engine import DIRECTIONS, OPPOSITES, SnakeEngine
+
+MAX_TIMINGS = 1000  # number of the last calls the timing percentiles are taken over
+
+
+class Autopilot:
+    """Controller that steers the snake to the food along a shortest path through the wrap-around, and chases
+     its own tail when there is no safe way to the food.
+
+     The path comes from a breadth-first search outwards from the food, which labels free cells with their
+     distance to it. The snake only moves closer to the food, so the labels stay valid while it moves and
+     the search only starts over when the food moves. Each call expands the search until it reaches the
+     head or the time budget runs out. An unfinished search continues on the next call, and the snake heads
+     straight for the food meanwhile, so a call stays within the budget, even on large boards.
+     A search that finished without reaching the head, because the snake was in the way, starts over once
+     the tail has moved and may have opened a path."""
+
+    CHECK_INTERVAL = 16  # cells expanded between checks of the time budget
+    # fraction of the budget left when the search stops, for the expansions between checks and choosing the move
+    SEARCH_MARGIN = 0.2
+
+    def __init__(self, engine: SnakeEngine, budget: float = 0.002) -> None:
+        self.budget = budget  # seconds a call may spend searching
+        self.grid_size = engine.grid_size
+        cells = engine.grid_size[0] * engine.grid_size[1]
+        self._distances = array("i", [0]) * cells  # steps from each labeled cell to the food
+        # number of the search that labeled each cell, so a new search needs no clearing
+        self._labels = array("I", [0]) * cells
+        self._search_number = 0
+        self._frontier: deque[int] = deque()  # labeled cells whose neighbors are not labeled yet
+        self._target: tuple[int, int] | None = None  # food cell of the current search
+        self._search_tail: tuple[int, int] | None = None  # tail cell when the current search started
+        # timing stats
+        self.calls = 0
+        self.searches = 0  # number of searches started, one per food cell
+        self.expanded = 0  # number of cells expanded by all searches
+        self.estimates = 0  # number of calls that headed straight for the food while the search was unfinished
+        self.fallbacks = 0  # number of calls that chased the tail
+        self.over_budget = 0  # number of calls that took longer than the budget
+        self.max_time = 0.0  # longest call in seconds
+        self._timings: deque[float] = deque(maxlen=MAX_TIMINGS)
+
+    def reset(self) -> None:
+        """Drops the search, for example when the engine starts a new game. The stats are kept."""
+        self._target = None
+        self._search_tail = None
+        self._frontier.clear()
+
+    def __call__(self, engine: SnakeEngine) -> str | None:
+        """Returns the direction to turn in before the next step, or None to keep going."""
+        start = time.perf_counter()
+        direction = self._choose(engine, start + self.budget * (1 - self.SEARCH_MARGIN))
+        elapsed = time.perf_counter() - start
+        self.calls += 1
+        self.over_budget += elapsed > self.budget
+        self.max_time = max(self.max_time, elapsed)
+        self._timings.append(elapsed)
+        return direction
+
+    def _choose(self, engine: SnakeEngine, deadline: float) -> str | None:
+        """Returns the direction to the food if there is a safe one, else the direction chasing the tail.
+         Heads straight for the food while the search has not reached the head yet."""
+        if engine.food is None:  # the board is full
+            return None
+        occupied = engine.occupancy
+        # (direction, cell index) of the neighbors of the head the snake can move to, a u-turn is not allowed
+        moves = [(direction, self._index(engine.head, direction)) for direction in DIRECTIONS
+                 if direction != OPPOSITES[engine.direction]]
+        free_moves = [(direction, index) for direction, index in moves if not occupied[index]]
+        labeled = any(self._labels[index] == self._search_number for _, index in free_moves)
+        if engine.food != self._target:
+            self._start_search(engine.food, engine.tail)
+            labeled = False
+        elif not labeled and not self._frontier and engine.tail != self._search_tail:
+            # the search finished without reaching the head, the moved tail may have opened a path
+            self._start_search(engine.food, engine.tail)
+        if not labeled:
+            self._search(occupied, {index for _, index in free_moves}, deadline)
+
+        best, best_distance = None, None
+        for direction, index in free_moves:
+            if self._labels[index] != self._search_number or not self._has_exit(index, engine):
+                continue
+            if best_distance is None or self._distances[index] < best_distance:
+                best, best_distance = direction, self._distances[index]
+        if best is not None:
+            return best
+        if self._frontier:  # the search is unfinished
+            self.estimates += 1
+            if (best := self._head_for_food(engine, free_moves)) is not None:
+                return best
+        self.fallbacks += 1
+        return self._chase_tail(engine, moves)
+
+    def _index(self, cell: tuple[int, int], direction: str) -> int:
+        """Returns the index of the cell one step from a cell in a direction, wrapping around the board."""
+        cols, rows = self.grid_size
+        dx, dy = DIRECTIONS[direction]
+        return (cell[1] + dy) % rows * cols + (cell[0] + dx) % cols
+
+    def _neighbors(self, index: int) -> tuple[int, int, int, int]:
+        """Returns the indices of the four cells next to a cell, wrapping around the board."""
+        cols, rows = self.grid_size
+        y, x = divmod(index, cols)
+        row = y * cols
+        return (((y - 1) % rows) * cols + x, ((y + 1) % rows) * cols + x,
+                row + (x - 1) % cols, row + (x + 1) % cols)
+
+    def _has_exit(self, index: int, engine: SnakeEngine) -> bool:
+        """Returns True if a cell has a free neighbor other than the head, so moving there is not a dead end."""
+        head = engine.head[1] * self.grid_size[0] + engine.head[0]
+        occupied = engine.occupancy
+        return any(not occupied[neighbor] and neighbor != head for neighbor in self._neighbors(index))
+
+    def _start_search(self, food: tuple[int, int], tail: tuple[int, int]) -> None:
+        """Starts a new search from the food cell, with the snake's tail at the given cell."""
+        self._target = food
+        self._search_tail = tail
+        self._search_number += 1
+        self.searches += 1
+        index = food[1] * self.grid_size[0] + food[0]
+        self._labels[index] = self._search_number
+        self._distances[index] = 0
+        self._frontier = deque([index])
+
+    def _search(self, occupied: bytearray, goals: set[int], deadline: float) -> None:
+        """Expands the search until one of the goal cells is labeled, every reachable cell is labeled,
+         or the deadline has passed."""
+        labels, distances, frontier = self._labels, self._distances, self._frontier
+        number = self._search_number
+        expanded = 0
+        found = False
+        while frontier and not found:
+            index = frontier.popleft()
+            distance = distances[index] + 1
+            for neighbor in self._neighbors(index):
+                if labels[neighbor] != number and not occupied[neighbor]:
+                    labels[neighbor] = number
+                    distances[neighbor] = distance
+                    frontier.append(neighbor)
+                    found = found or neighbor in goals
+            expanded += 1
+            if expanded % self.CHECK_INTERVAL == 0 and time.perf_counter() >= deadline:
+                break
+        self.expanded += expanded
+
+    def _head_for_food(self, engine: SnakeEngine, moves: list[tuple[str, int]]) -> str | None:
+        """Returns the direction of the free move that is not a dead end and closest to the food, ignoring
+         the snake in the way."""
+        cols, rows = self.grid_size
+        food_x, food_y = engine.food
+        best, best_distance = None, None
+        for direction, index in moves:
+            if not self._has_exit(index, engine):
+                continue
+            y, x = divmod(index, cols)
+            dx, dy = abs(x - food_x), abs(y - food_y)
+            distance = min(dx, cols - dx) + min(dy, rows - dy)
+            if best_distance is None or distance < best_distance:
+                best, best_distance = direction, distance
+        return best
+
+    def _chase_tail(self, engine: SnakeEngine, moves: list[tuple[str, int]]) -> str | None:
+        """Returns the direction of the move closest to the tail that does not hit the snake. The tail cell
+         itself is free on the next step, unless the snake is growing."""
+        cols, rows = self.grid_size
+        occupied = engine.occupancy
+        tail_x, tail_y = engine.tail
+        tail = tail_y * cols + tail_x
+        tail_moves = not engine.pending_growth
+        best, best_key = None, None
+        for direction, index in moves:
+            if occupied[index] and not (index == tail and tail_moves):
+                continue
+            y, x = divmod(index, cols)
+            dx, dy = abs(x - tail_x), abs(y - tail_y)
+            distance = min(dx, cols - dx) + min(dy, rows - dy)
+            exits = sum(not occupied[neighbor] for neighbor in self._neighbors(index))
+            # closest to the tail first, the most free neighbors among equally close moves
+            key = distance, -exits
+            if best_key is None or key < best_key:
+                best, best_key = direction, key
+        return best
+
+    def stats(self) -> dict[str, float | int]:
+        """Returns the timing stats of the calls so far. The percentiles are over the last calls."""
+        timings = sorted(self._timings)
+        return {
+            "calls": self.calls,
+            "searches": self.searches,
+            "expanded": self.expanded,
+            "estimates": self.estimates,
+            "fallbacks": self.fallbacks,
+            "over_budget": self.over_budget,
+            "budget_us": self.budget * 1e6,
+            "median_us": timings[len(timings) // 2] * 1e6 if timings else 0.0,
+            "p99_us": timings[min(len(timings) - 1, len(timings) * 99 // 100)] * 1e6 if timings else 0.0,
+            "max_us": self.max_time * 1e6,
+        }
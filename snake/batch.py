@@ -0,0 +1,138 @@
+import numpy as np
+
+from engine import DIRECTIONS
+
+# Actions are indices into this tuple, -1 keeps the current direction.
+# The order is chosen so that the opposite of action a is a ^ 1.
+ACTIONS = ("up", "down", "left", "right")
+_DELTAS = np.array([DIRECTIONS[action] for action in ACTIONS], dtype=np.int64)  # (column, row) steps
+
+
+class BatchSnakeEngine:
+    """Steps many independent snake games at once with NumPy array operations. Follows the rules of
+     SnakeEngine, and each board stores for every cell the number of ticks until the snake leaves it."""
+
+    def __init__(self,
+                 num_games: int,
+                 grid_size: tuple[int, int],
+                 max_food_dist: int = 5,
+                 seed: int | None = None,
+                 auto_reset: bool = True) -> None:
+        if num_games < 1:
+            raise ValueError("Number of games must be at least 1.")
+        if grid_size[0] < 4 or grid_size[1] < 2:
+            raise ValueError("Grid size must be at least 4x2 tiles.")
+        self.num_games = num_games
+        self.grid_size = grid_size
+        self.max_food_dist = max_food_dist
+        self.auto_reset = auto_reset  # games that are done are reset in the same step
+        self.rng = np.random.default_rng(seed)
+
+        cols, rows = grid_size
+        self.boards = np.zeros((num_games, rows, cols), dtype=np.int32)
+        self.heads = np.zeros((num_games, 2), dtype=np.int64)  # (column, row)
+        self.foods = np.zeros((num_games, 2), dtype=np.int64)
+        self.directions = np.zeros(num_games, dtype=np.int8)
+        self._last_moved = np.zeros(num_games, dtype=np.int8)
+        self.lengths = np.zeros(num_games, dtype=np.int32)
+        self.scores = np.zeros(num_games, dtype=np.int32)
+        self.ticks = np.zeros(num_games, dtype=np.int64)
+        self.done = np.zeros(num_games, dtype=bool)
+        self._games = np.arange(num_games)
+        self._columns = np.arange(cols)
+        self._rows = np.arange(rows)
+        self._observation = np.zeros((num_games, 3, rows, cols), dtype=np.uint8)
+        self.reset()
+
+    def reset(self, mask: np.ndarray | None = None) -> np.ndarray:
+        """Resets the games selected by the boolean mask, or all games. Returns the observations."""
+        games = self._games if mask is None else np.flatnonzero(mask)
+        if games.size:
+            cols, rows = self.grid_size
+            x, y = cols // 2 - 1, rows // 2
+            self.boards[games] = 0
+            self.boards[games, y, x] = 2  # head
+            self.boards[games, y, x - 1] = 1  # tail
+            self.heads[games] = (x, y)
+            self.directions[games] = ACTIONS.index("right")
+            self._last_moved[games] = self.directions[games]
+            self.lengths[games] = 2
+            self.scores[games] = 0
+            self.ticks[games] = 0
+            self.done[games] = False
+            self._spawn_food(games)
+        return self.observe()
+
+    def observe(self) -> np.ndarray:
+        """Returns the observations as an (N, 3, rows, columns) array of body, head and food planes.
+         The array is reused between calls."""
+        obs = self._observation
+        np.greater(self.boards, 0, out=obs[:, 0])
+        obs[:, 1:] = 0
+        obs[self._games, 1, self.heads[:, 1], self.heads[:, 0]] = 1
+        obs[self._games, 2, self.foods[:, 1], self.foods[:, 0]] = 1
+        return obs
+
+    def step(self, actions: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Advances all games by one tick with an action index per game (-1 keeps the direction).
+         Returns the observations, rewards (1 for eating, -1 for dying, else 0) and done flags.
+         Without auto_reset, games that are done stay frozen until they are reset."""
+        actions = np.asarray(actions, dtype=np.int8)
+        if actions.shape != (self.num_games,):
+            raise ValueError(f"Expected {self.num_games} actions, got shape {actions.shape}.")
+        # turn, u-turns into the neck are ignored
+        active = ~self.done
+        turning = active & (actions >= 0) & (actions != (self._last_moved ^ 1))
+        self.directions[turning] = actions[turning]
+        self._last_moved[:] = self.directions
+
+        # move, leaving the board wraps to the opposite side
+        cols, rows = self.grid_size
+        new_heads = self.heads + _DELTAS[self.directions] * active[:, None]
+        new_heads[:, 0] %= cols
+        new_heads[:, 1] %= rows
+        xs, ys = new_heads[:, 0], new_heads[:, 1]
+        self.heads = new_heads
+        self.ticks += active
+
+        # the tail leaves its cell unless the snake eats this tick
+        ate = active & (new_heads == self.foods).all(axis=1)
+        self.boards -= (self.boards > 0) & (active & ~ate)[:, None, None]
+        died = active & (self.boards[self._games, ys, xs] > 0)
+        self.lengths += ate
+        self.scores += ate
+        self.boards[active, ys[active], xs[active]] = self.lengths[active]
+
+        eaten = np.flatnonzero(ate & ~died)
+        won = np.zeros(self.num_games, dtype=bool)
+        if eaten.size:
+            won[eaten] = ~self._spawn_food(eaten)
+        rewards = ate.astype(np.int32) - died
+        done = died | won
+        self.done |= done
+        if self.auto_reset and done.any():
+            self.reset(done)
+        return self.observe(), rewards, done
+
+    def _spawn_food(self, games: np.ndarray) -> np.ndarray:
+        """Places new food on a random free cell for each of the given games, preferring cells no closer
+         than max_food_dist to the head. Returns which of the games had a free cell left."""
+        boards = self.boards[games]
+        heads = self.heads[games]
+        free = boards == 0
+        far = ((np.abs(self._columns[None, None, :] - heads[:, 0, None, None]) >= self.max_food_dist)
+               | (np.abs(self._rows[None, :, None] - heads[:, 1, None, None]) >= self.max_food_dist))
+        candidates = free & far
+        # fall back to any free cell on boards without a far enough free cell
+        near_only = ~candidates.any(axis=(1, 2))
+        candidates[near_only] = free[near_only]
+        has_free = candidates.any(axis=(1, 2))
+
+        # the highest random weight among the candidate cells picks a uniformly random cell
+        weights = self.rng.random(candidates.shape)
+        weights[~candidates] = -1
+        cells = weights.reshape(len(games), -1).argmax(axis=1)
+        rows, cols = np.divmod(cells, self.grid_size[0])
+        self.foods[games[has_free], 0] = cols[has_free]
+        self.foods[games[has_free], 1] = rows[has_free]
+        return has_free
@@ -0,0 +1,230 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Callable
+
+# The benchmark runs without a window or sound device
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")  # keeps the JSON results on stdout parseable
+
+import pygame as pg
+
+import sprites
+from assets import registry
+from engine import SnakeEngine, DIRECTIONS
+from snakegame import SnakeGame
+
+# Boards need an even number of rows, so the serpentine path is a cycle the snake can follow forever
+ENGINE_BOARDS = [(28, 20), (100, 100), (200, 100), (1000, 1000)]
+GAME_BOARDS = [(20, 14), (28, 20)]
+WORLD_BOARDS = [(1000, 1000)]  # larger than the window, drawn by the scrolling view
+WORLD_SCREEN_SIZE = 640, 480
+LENGTHS = [10, 100, 1000, 5000, 50000]
+MAX_FILL = 0.8  # lengths covering more of the board than this are skipped
+
+
+def serpentine_turn(head: tuple[int, int], direction: str, grid_size: tuple[int, int]) -> str | None:
+    """Returns the turn that keeps the snake on a path sweeping the board row by row, if it needs one."""
+    x, _ = head
+    if direction == "right" and x == grid_size[0] - 1 or direction == "left" and x == 0:
+        return "down"
+    if direction == "down":
+        return "left" if x == grid_size[0] - 1 else "right"
+    return None
+
+
+def step_engine(engine: SnakeEngine) -> None:
+    """Advances the engine one tick along the serpentine path."""
+    engine.step(serpentine_turn(engine.head, engine.direction, engine.grid_size))
+
+
+def tick_game(game: SnakeGame) -> None:
+    """Advances the game one tick along the serpentine path."""
+    if (direction := serpentine_turn(game.engine.head, game.engine.direction, game.engine.grid_size)) is not None:
+        game.turn(direction)
+    game.tick()
+
+
+def cell_ahead(engine: SnakeEngine) -> tuple[int, int]:
+    """Returns the cell the head of the engine moves to on the next serpentine tick."""
+    direction = serpentine_turn(engine.head, engine.direction, engine.grid_size) or engine.direction
+    dx, dy = DIRECTIONS[direction]
+    return (engine.head[0] + dx) % engine.grid_size[0], (engine.head[1] + dy) % engine.grid_size[1]
+
+
+def measure(func: Callable[[], None],
+            iterations: int,
+            setup: Callable[[], None] | None = None) -> dict[str, float | int]:
+    """Calls the function the given number of times and returns its timings in microseconds.
+     The setup function is called before each call without being measured."""
+    timings = []
+    for _ in range(iterations):
+        if setup is not None:
+            setup()
+        start = time.perf_counter_ns()
+        func()
+        timings.append((time.perf_counter_ns() - start) / 1000)
+    timings.sort()
+    return {
+        "iterations": iterations,
+        "mean_us": statistics.fmean(timings),
+        "median_us": timings[len(timings) // 2],
+        "p99_us": timings[min(len(timings) - 1, len(timings) * 99 // 100)],
+    }
+
+
+def bench_engine(grid_size: tuple[int, int], length: int, iterations: int) -> list[dict]:
+    """Benchmarks the headless engine with a snake of the given length."""
+    engine = SnakeEngine(grid_size, seed=0)
+    max_length = grid_size[0] * grid_size[1] * MAX_FILL
+
+    def prepare() -> None:
+        engine.reset(seed=0)
+        engine.grow(length - 2)
+        while engine.pending_growth:
+            step_engine(engine)
+
+    def place_food() -> None:
+        if engine.length >= max_length:  # eating must not fill the board
+            prepare()
+        engine.food = cell_ahead(engine)
+
+    results = []
+    for name, func, setup in [("engine.step", lambda: step_engine(engine), None),
+                              ("engine.eat", lambda: step_engine(engine), place_food),
+                              ("engine.grow", lambda: engine.grow(1), None)]:
+        prepare()  # every benchmark starts from a snake of the benchmark length
+        results.append((name, measure(func, iterations, setup)))
+    return [{"name": name, "board": list(grid_size), "length": length, **timings} for name, timings in results]
+
+
+def bench_game(game: SnakeGame, length: int, iterations: int) -> list[dict]:
+    """Benchmarks the pygame game with a snake of the given length."""
+    background = registry.image("background.png", alpha=False)
+    screen = pg.display.get_surface()
+    max_length = game.engine.grid_size[0] * game.engine.grid_size[1] * MAX_FILL
+
+    def prepare() -> None:
+        game.restart()
+        game.grow(length - 2)
+        while game.engine.pending_growth:
+            tick_game(game)
+        game._update_screen(screen, background)
+
+    def place_food() -> None:
+        if game.engine.length >= max_length:  # eating must not fill the board
+            prepare()
+        game.engine.food = cell_ahead(game.engine)
+
+    def update_top_bar() -> None:
+        game._top_bar.current_score += 1
+        game._top_bar.update_rect()
+
+    def update_screen() -> None:
+        tick_game(game)  # not measured separately, gives the renderer the regions of a normal tick
+        game._update_screen(screen, background)
+
+    def redraw_screen() -> None:
+        game._redraw_all = True
+        game._update_screen(screen, background)
+
+    results = []
+    for name, func, setup in [("game.tick", lambda: tick_game(game), None),
+                              ("game.eat", lambda: tick_game(game), place_food),
+                              ("game.grow", lambda: game.grow(1), None),
+                              ("top_bar.update_rect", update_top_bar, None),
+                              ("game.tick+update_screen", update_screen, None),
+                              ("game.redraw_screen", redraw_screen, None)]:
+        prepare()  # every benchmark starts from a snake of the benchmark length
+        results.append((name, measure(func, iterations, setup)))
+    board = list(game.engine.grid_size)
+    return [{"name": name, "board": board, "length": length, **timings} for name, timings in results]
+
+
+def run(lengths: list[int], iterations: int, engine_only: bool) -> dict:
+    """Runs all benchmarks and returns the results."""
+    results = []
+    for grid_size in ENGINE_BOARDS:
+        for length in lengths:
+            if length <= grid_size[0] * grid_size[1] * MAX_FILL:
+                results += bench_engine(grid_size, length, iterations)
+    if not engine_only:
+        for grid_size in GAME_BOARDS:
+            game = SnakeGame(screen_size=(grid_size[0] * sprites.TILE_SIZE[0], grid_size[1] * sprites.TILE_SIZE[1]),
+                             title="Snake benchmark",
+                             tick_rate=11,
+                             score_path=None)
+            for length in lengths:
+                if length <= grid_size[0] * grid_size[1] * MAX_FILL:
+                    results += bench_game(game, length, iterations)
+        for grid_size in WORLD_BOARDS:
+            game = SnakeGame(screen_size=WORLD_SCREEN_SIZE,
+                             title="Snake benchmark",
+                             tick_rate=11,
+                             score_path=None,
+                             grid_size=grid_size)
+            for length in lengths:
+                if length <= grid_size[0] * grid_size[1] * MAX_FILL:
+                    results += bench_game(game, length, iterations)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "pygame": pg.version.ver,
+            "platform": platform.platform(),
+            "iterations": iterations,
+        },
+        "results": results,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> bool:
+    """Prints the change of each median against the baseline to stderr, stdout may hold the JSON results.
+     Returns False if any benchmark got slower by more than the threshold fraction."""
+    def key(result: dict) -> tuple:
+        return result["name"], tuple(result["board"]), result["length"]
+
+    baseline_results = {key(result): result for result in baseline["results"]}
+    ok = True
+    for result in results["results"]:
+        if (old := baseline_results.get(key(result))) is None:
+            continue
+        change = result["median_us"] / old["median_us"] - 1 if old["median_us"] else 0.0
+        regressed = change > threshold
+        ok &= not regressed
+        print(f"{'REGRESSION ' if regressed else ''}{result['name']} board={result['board']}"
+              f" length={result['length']}: {old['median_us']:.1f} -> {result['median_us']:.1f} us ({change:+.0%})",
+              file=sys.stderr)
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks the snake game hot paths.")
+    parser.add_argument("--output", default=None, help="JSON file to write the results to, default is stdout")
+    parser.add_argument("--compare", default=None, help="baseline JSON file to compare the results with")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="slowdown fraction of a median that counts as a regression")
+    parser.add_argument("--iterations", type=int, default=200, help="calls measured per benchmark")
+    parser.add_argument("--lengths", type=int, nargs="+", default=LENGTHS, help="snake lengths to measure")
+    parser.add_argument("--engine-only", action="store_true", help="only benchmark the headless engine")
+    args = parser.parse_args()
+
+    results = run(args.lengths, args.iterations, args.engine_only)
+    if args.output is None:
+        print(json.dumps(results, indent=2))
+    else:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if not compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+import random
+from typing import Callable
+
+from engine import DIRECTIONS, OPPOSITES, SnakeEngine
+
+# A controller is called with the engine before every step and returns the direction to turn in, or None to
+# keep going. Controllers are made for each game by a factory that is called with the engine of the game.
+Controller = Callable[[SnakeEngine], str | None]
+ControllerFactory = Callable[[SnakeEngine], Controller]
+
+
+def wrapped_distance(cell_from: tuple[int, int], cell_to: tuple[int, int], grid_size: tuple[int, int]) -> int:
+    """Returns the number of steps between two cells when moving through the wrap-around is allowed."""
+    dx = abs(cell_to[0] - cell_from[0])
+    dy = abs(cell_to[1] - cell_from[1])
+    return min(dx, grid_size[0] - dx) + min(dy, grid_size[1] - dy)
+
+
+def next_cell(cell: tuple[int, int], direction: str, grid_size: tuple[int, int]) -> tuple[int, int]:
+    """Returns the cell one step from the given cell in a direction, wrapping around the board edges."""
+    dx, dy = DIRECTIONS[direction]
+    return (cell[0] + dx) % grid_size[0], (cell[1] + dy) % grid_size[1]
+
+
+class RandomBot:
+    """Controller that turns in a random direction that does not hit the snake, if there is one."""
+
+    def __init__(self, engine: SnakeEngine) -> None:
+        self.rng = random.Random(engine.seed)
+
+    def __call__(self, engine: SnakeEngine) -> str | None:
+        directions = [direction for direction in DIRECTIONS if direction != OPPOSITES[engine.direction]
+                      and not engine.is_occupied(next_cell(engine.head, direction, engine.grid_size))]
+        return self.rng.choice(directions) if directions else None
+
+
+class GreedyBot:
+    """Controller that moves along the shortest way to the food, avoiding cells on the snake one step ahead."""
+
+    def __init__(self, engine: SnakeEngine) -> None:
+        pass
+
+    def __call__(self, engine: SnakeEngine) -> str | None:
+        if engine.food is None:
+            return None
+        best, best_distance = None, None
+        for direction in DIRECTIONS:
+            if direction == OPPOSITES[engine.direction]:
+                continue
+            cell = next_cell(engine.head, direction, engine.grid_size)
+            if engine.is_occupied(cell):
+                continue
+            distance = wrapped_distance(cell, engine.food, engine.grid_size)
+            if best_distance is None or distance < best_distance:
+                best, best_distance = direction, distance
+        return best
@@ -0,0 +1,198 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+from collections import deque
+from typing import Callable
+
+from bots import next_cell, wrapped_distance
+from engine import DIRECTIONS, OPPOSITES
+from queue_handler import DIRECTION_NAMES
+from netcode import ArenaMirror, decode_welcome, encode_input, encode_join, read_message
+
+RENDER_FPS = 60
+
+
+class ArenaClient:
+    """Connection of a player to an arena server, with the copy of the arena the server keeps up to date.
+     Measures the input latency, the time from sending a turn until the tick it was applied on arrives."""
+
+    def __init__(self,
+                 reader: asyncio.StreamReader,
+                 writer: asyncio.StreamWriter,
+                 player: int,
+                 mirror: ArenaMirror,
+                 tick_rate: int) -> None:
+        self.reader = reader
+        self.writer = writer
+        self.player = player
+        self.mirror = mirror
+        self.tick_rate = tick_rate
+        self.ticks = 0  # number of ticks received
+        self.bytes_received = 0  # bytes of the tick messages received
+        self.latencies: list[float] = []  # input latencies in seconds
+        self._sent: deque[tuple[int, float]] = deque()  # (frame, send time) of the turns not applied yet
+
+    @classmethod
+    async def connect(cls, host: str, port: int) -> "ArenaClient":
+        """Joins the arena of a server and returns the client once the snapshot of the arena has arrived."""
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(encode_join())
+        player, grid_size, tick_rate = decode_welcome(await read_message(reader))
+        mirror = ArenaMirror(grid_size)
+        mirror.apply(await read_message(reader))
+        return cls(reader, writer, player, mirror, tick_rate)
+
+    def turn(self, direction: str) -> None:
+        """Sends a turn, stamped with the last frame the client has seen."""
+        self.writer.write(encode_input(self.mirror.frame, direction))
+        self._sent.append((self.mirror.frame, time.perf_counter()))
+
+    async def receive(self, on_tick: Callable[["ArenaClient"], None] | None = None) -> None:
+        """Applies the ticks from the server until it disconnects, calling on_tick after each one."""
+        try:
+            while True:
+                payload = await read_message(self.reader)
+                self.mirror.apply(payload)
+                self.ticks += 1
+                self.bytes_received += len(payload)
+                now = time.perf_counter()
+                # a turn stamped with a frame is applied before the step to the next frame at the earliest
+                while self._sent and self._sent[0][0] < self.mirror.frame:
+                    self.latencies.append(now - self._sent.popleft()[1])
+                if on_tick is not None:
+                    on_tick(self)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+def greedy_turn(mirror: ArenaMirror, player: int) -> str | None:
+    """Returns the direction of the free cell next to the head of a player's snake that is closest to the
+     nearest food, or None if there is none or the snake is dead."""
+    snake = mirror.snakes.get(player)
+    if snake is None or not snake.alive or not mirror.food:
+        return None
+    cols = mirror.grid_size[0]
+    head = snake.body[0]
+    food = min(mirror.food, key=lambda cell: wrapped_distance(head, cell, mirror.grid_size))
+    best, best_distance = None, None
+    for direction in DIRECTIONS:
+        if direction == OPPOSITES[snake.direction]:
+            continue
+        x, y = next_cell(head, direction, mirror.grid_size)
+        if mirror.owners[y * cols + x]:
+            continue
+        distance = wrapped_distance((x, y), food, mirror.grid_size)
+        if best_distance is None or distance < best_distance:
+            best, best_distance = direction, distance
+    return best
+
+
+def steer(client: ArenaClient) -> None:
+    """Turns a bot's snake towards the food after a tick, only sending turns that change its direction."""
+    snake = client.mirror.snakes.get(client.player)
+    if (direction := greedy_turn(client.mirror, client.player)) is not None and direction != snake.direction:
+        client.turn(direction)
+
+
+def wander(client: ArenaClient) -> None:
+    """Turns a bot's snake in a random direction now and then, into other snakes and their tails as well,
+     so every kind of collision happens."""
+    if random.random() < 0.3:
+        client.turn(random.choice(DIRECTION_NAMES))
+
+
+async def run_bots(host: str, port: int, count: int, ticks: int, random_turns: bool = False) -> dict:
+    """Connects bot clients that play for a number of ticks, and returns their traffic and latency stats.
+     The bots compare their copy of the arena with the server's after every tick. With random_turns the bots
+     turn at random instead of steering to the food."""
+    clients = [await ArenaClient.connect(host, port) for _ in range(count)]
+    for client in clients:
+        client.mirror.verify = True
+    tasks = [asyncio.create_task(client.receive(wander if random_turns else steer)) for client in clients]
+    start = time.perf_counter()
+    while min(client.ticks for client in clients) < ticks and not all(task.done() for task in tasks):
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    for client in clients:
+        client.close()
+    await asyncio.gather(*tasks)
+
+    latencies = sorted(latency for client in clients for latency in client.latencies)
+    received_ticks = sum(client.ticks for client in clients)
+    return {
+        "bots": count,
+        "ticks": min(client.ticks for client in clients),
+        "grid_size": list(clients[0].mirror.grid_size),
+        "checksum_errors": sum(client.mirror.checksum_errors for client in clients),
+        "bytes_per_tick": sum(client.bytes_received for client in clients) / received_ticks if received_ticks else 0,
+        "bytes_per_second_per_client": sum(client.bytes_received for client in clients) / count / elapsed,
+        "turns": len(latencies),
+        "latency_ms": {
+            "median": statistics.median(latencies) * 1000 if latencies else 0.0,
+            "p99": latencies[min(len(latencies) - 1, len(latencies) * 99 // 100)] * 1000 if latencies else 0.0,
+            "max": latencies[-1] * 1000 if latencies else 0.0,
+        },
+        "best_score": max(snake.score for snake in clients[0].mirror.snakes.values()),
+    }
+
+
+async def play(host: str, port: int) -> None:
+    """Joins the arena with a window showing the board around the player's snake."""
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    import pygame as pg  # pygame is only needed to play, not for the bots
+    from snakegame import MAX_SCREEN_SIZE, SnakeGame
+    from sprites import TILE_SIZE
+    from world_view import ArenaView
+
+    client = await ArenaClient.connect(host, port)
+    pg.init()
+    cols, rows = client.mirror.grid_size
+    screen = pg.display.set_mode((min(cols * TILE_SIZE[0], MAX_SCREEN_SIZE[0]),
+                                  min(rows * TILE_SIZE[1], MAX_SCREEN_SIZE[1])))
+    pg.display.set_caption(f"Snake arena - player {client.player}")
+    view = ArenaView(client.mirror, client.player, screen.get_rect())
+    receiving = asyncio.create_task(client.receive())
+    try:
+        while not receiving.done():
+            for event in pg.event.get():
+                if event.type == pg.QUIT or event.type == pg.KEYDOWN and event.key == pg.K_ESCAPE:
+                    return
+                if event.type == pg.KEYDOWN and event.key in SnakeGame.DIRECTION_KEYS:
+                    client.turn(SnakeGame.DIRECTION_KEYS[event.key])
+            view.draw(screen)
+            pg.display.flip()
+            # the window is drawn between the ticks on the same loop, a blocking clock would delay them
+            await asyncio.sleep(1 / RENDER_FPS)
+    finally:
+        client.close()
+        await receiving
+        pg.quit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Joins a multiplayer arena server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5555)
+    parser.add_argument("--bots", type=int, default=0,
+                        help="connect this many headless bots instead of playing, and print their stats")
+    parser.add_argument("--ticks", type=int, default=500, help="ticks the bots play for")
+    parser.add_argument("--random-turns", action="store_true",
+                        help="let the bots turn at random instead of steering to the food, so they also run into "
+                             "other snakes and follow their tails")
+    args = parser.parse_args()
+
+    if args.bots:
+        print(json.dumps(asyncio.run(run_bots(args.host, args.port, args.bots, args.ticks, args.random_turns)), indent=2))
+    else:
+        asyncio.run(play(args.host, args.port))
+
+
+if __name__ == '__main__':
+    main()
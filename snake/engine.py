@@ -0,0 +1,285 @@
+import random
+import struct
+from array import array
+from collections import deque
+from itertools import chain
+
+# Maps directions to the change in (column, row) when moving one tile.
+DIRECTIONS = {
+    "up": (0, -1),
+    "down": (0, 1),
+    "left": (-1, 0),
+    "right": (1, 0)
+}
+OPPOSITES = {"up": "down", "down": "up", "left": "right", "right": "left"}
+_DIRECTION_NAMES = tuple(DIRECTIONS)
+
+SNAPSHOT_VERSION = 2
+# version, columns, rows, direction index, last moved direction index, flags, pending growth, score, ticks,
+# food column, food row, seed, number of body cells
+_SNAPSHOT = struct.Struct("<BHHBBBIIIHHQI")
+_GAME_OVER, _WON, _HAS_FOOD, _HAS_SEED, _HAS_GAUSS = 1, 2, 4, 8, 16  # snapshot flags
+_RNG_VERSION = 3  # version of the random.Random state
+SEED_LIMIT = 2 ** 64  # seeds are stored in 64 bits, in snapshots and replays
+
+
+def direction_between(cell_from: tuple[int, int],
+                      cell_to: tuple[int, int],
+                      grid_size: tuple[int, int]) -> str | None:
+    """Returns the direction from one cell to an adjacent cell, taking the wrap-around into account.
+     Returns None if the cells are equal or not adjacent."""
+    dx = cell_to[0] - cell_from[0]
+    dy = cell_to[1] - cell_from[1]
+    # cells on opposite edges of the board are adjacent through the wrap-around
+    if abs(dx) == grid_size[0] - 1 and grid_size[0] > 2:
+        dx = -1 if dx > 0 else 1
+    if abs(dy) == grid_size[1] - 1 and grid_size[1] > 2:
+        dy = -1 if dy > 0 else 1
+    for direction, delta in DIRECTIONS.items():
+        if delta == (dx, dy):
+            return direction
+    return None
+
+
+class SnakeEngine:
+    """Class containing the snake game rules on a grid of tiles, without any pygame dependency.
+     Cells are (column, row) tuples where (0, 0) is the top left tile of the board."""
+
+    def __init__(self,
+                 grid_size: tuple[int, int],
+                 max_food_dist: int = 5,
+                 seed: int | None = None) -> None:
+        if grid_size[0] < 4 or grid_size[1] < 2:
+            raise ValueError("Grid size must be at least 4x2 tiles.")
+        self.grid_size = grid_size
+        self.max_food_dist = max_food_dist  # food spawns no closer than this many tiles from the head
+        self.seed: int | None = None  # seed of the current game, None for a random one
+        self.rng = random.Random()
+        self.body: deque[tuple[int, int]] = deque()  # head first, tail last
+        self._occupied = bytearray(grid_size[0] * grid_size[1])  # 1 for cells covered by the snake, by row
+        # indices of the cells not covered by the snake, and the position of each cell in that array (-1 if covered)
+        self._free = array("i")
+        self._free_pos = array("i")
+        self._all_cells = array("i", range(grid_size[0] * grid_size[1]))  # copied to free every cell at once
+        self.direction = "right"
+        self._last_moved = "right"  # direction of the last step, used to prevent u-turns into the neck
+        self.pending_growth = 0  # number of the next steps the tail stays in place on
+        self.food: tuple[int, int] | None = (0, 0)  # None when the board is full
+        self.score = 0
+        self.game_over = False
+        self.won = False
+        self.ticks = 0
+        self._rng_state: bytes | None = None  # packed random state for snapshots, None after the rng was used
+        self._gauss = False  # if the packed random state has a next gaussian
+        self.reset(seed)
+
+    def reset(self, seed: int | None = None) -> None:
+        """Resets the board to a new game with a two tile snake facing right.
+         With a seed the new game is reproducible, otherwise the random state continues from the last game."""
+        if seed is not None:
+            if not 0 <= seed < SEED_LIMIT:
+                raise ValueError(f"Seed must be between 0 and {SEED_LIMIT - 1}.")
+            self.seed = seed
+            self.rng.seed(seed)
+            self._rng_state = None
+        cols, rows = self.grid_size
+        x, y = cols // 2 - 1, rows // 2
+        self.body = deque([(x, y), (x - 1, y)])
+        self._clear_board()
+        for cell_x, cell_y in self.body:
+            self._occupy(cell_y * cols + cell_x)
+        self.direction = "right"
+        self._last_moved = "right"
+        self.pending_growth = 0
+        self.score = 0
+        self.game_over = False
+        self.won = False
+        self.ticks = 0
+        self.food = self._random_food_cell()
+
+    @property
+    def head(self) -> tuple[int, int]:
+        """Returns the cell of the snake's head."""
+        return self.body[0]
+
+    @property
+    def tail(self) -> tuple[int, int]:
+        """Returns the cell of the snake's tail."""
+        return self.body[-1]
+
+    @property
+    def length(self) -> int:
+        """Returns the length of the snake."""
+        return len(self.body)
+
+    def is_occupied(self, cell: tuple[int, int]) -> bool:
+        """Returns True if the snake covers the given cell."""
+        return self._occupied[cell[1] * self.grid_size[0] + cell[0]] == 1
+
+    @property
+    def occupancy(self) -> bytearray:
+        """Returns the cells by row, 1 for the cells covered by the snake. It must not be modified."""
+        return self._occupied
+
+    @property
+    def free_cells(self) -> int:
+        """Returns the number of cells not covered by the snake."""
+        return len(self._free)
+
+    def _clear_board(self) -> None:
+        """Marks every cell as free, with the free cells in board order."""
+        self._occupied = bytearray(len(self._all_cells))
+        self._free = self._all_cells[:]
+        self._free_pos = self._all_cells[:]
+
+    def _occupy(self, index: int) -> None:
+        """Marks the cell with the given index as covered by the snake."""
+        self._occupied[index] = 1
+        pos = self._free_pos[index]
+        if pos < 0:
+            return
+        # swap-remove the cell from the free cells
+        last = self._free.pop()
+        if last != index:
+            self._free[pos] = last
+            self._free_pos[last] = pos
+        self._free_pos[index] = -1
+
+    def _release(self, index: int) -> None:
+        """Marks the cell with the given index as free."""
+        self._occupied[index] = 0
+        if self._free_pos[index] < 0:
+            self._free_pos[index] = len(self._free)
+            self._free.append(index)
+
+    def turn(self, direction: str) -> None:
+        """Turns the snake's head in a given direction. Prevents the snake from doing a u-turn."""
+        if direction not in DIRECTIONS:
+            raise ValueError(f"Invalid direction: '{direction}'.")
+        if direction != OPPOSITES[self._last_moved]:
+            self.direction = direction
+
+    def grow(self, amount: int = 1) -> None:
+        """Grows the snake by a given amount of body parts. The tail stays in place on the next steps
+         until the snake has grown by the amount, so growing costs the same for any amount."""
+        if amount < 0:
+            raise ValueError("Growing amount must be greater than 0.")
+        self.pending_growth += amount
+
+    def step(self, action: str | None = None) -> tuple[int, bool]:
+        """Advances the game by one tick, optionally turning in the given direction first.
+         Returns the reward of the step (1 for eating, -1 for dying, else 0) and if the game is over."""
+        if self.game_over:
+            return 0, True
+        if action is not None:
+            self.turn(action)
+        cols, rows = self.grid_size
+        dx, dy = DIRECTIONS[self.direction]
+        x, y = self.body[0]
+        new_head = (x + dx) % cols, (y + dy) % rows  # moving outside the board wraps to the opposite side
+        self._last_moved = self.direction
+        self.ticks += 1
+
+        ate = new_head == self.food
+        if ate:
+            pass  # the tail stays in place, the snake grows by the eaten food
+        elif self.pending_growth:
+            self.pending_growth -= 1
+        else:
+            # the tail leaves its cell before the head enters a new one
+            tail_x, tail_y = self.body.pop()
+            self._release(tail_y * cols + tail_x)
+        index = new_head[1] * cols + new_head[0]
+        collided = self._occupied[index] == 1
+        self._occupy(index)
+        self.body.appendleft(new_head)
+        if collided:
+            self.game_over = True
+            return -1, True
+        if ate:
+            self.score += 1
+            self.food = self._random_food_cell()
+            if self.food is None:  # the snake covers the whole board
+                self.won = True
+                self.game_over = True
+                return 1, True
+            return 1, False
+        return 0, False
+
+    def _random_food_cell(self) -> tuple[int, int] | None:
+        """Returns a random cell that is not on the snake, and no closer than max_food_dist to the head
+         if there is such a cell. Returns None if the snake covers the whole board."""
+        if not self._free:
+            return None
+        self._rng_state = None
+        cols, rows = self.grid_size
+        head_x, head_y = self.body[0]
+        dist = self.max_food_dist
+        # count the free cells too close to the head, this square has a constant size
+        near_xs = range(max(head_x - dist + 1, 0), min(head_x + dist, cols))
+        near_ys = range(max(head_y - dist + 1, 0), min(head_y + dist, rows))
+        near_free = sum(not self._occupied[y * cols + x] for y in near_ys for x in near_xs)
+        # every draw is a free cell, so at most the near cells can be rejected
+        while True:
+            index = self._free[self.rng.randrange(len(self._free))]
+            y, x = divmod(index, cols)
+            if near_free == len(self._free) or abs(x - head_x) >= dist or abs(y - head_y) >= dist:
+                return x, y
+
+    def snapshot(self) -> bytes:
+        """Returns the full game state in a compact binary form that restore takes back, cheap enough to take
+         every tick. Only the snake's cells are stored, not the free cells, and the random state is only packed again
+         after food was placed. A snapshot is about 2.5 kB for the random state plus 4 bytes per snake cell, for any
+         board size. The cells are in the machine's byte order, so snapshots are meant to be kept in memory, not
+         saved."""
+        cols, rows = self.grid_size
+        if self._rng_state is None:
+            _, internal, gauss = self.rng.getstate()
+            self._rng_state = array("I", internal).tobytes() + struct.pack("<d", gauss or 0.0)
+            self._gauss = gauss is not None
+        flags = (_GAME_OVER * self.game_over | _WON * self.won | _HAS_FOOD * (self.food is not None)
+                 | _HAS_SEED * (self.seed is not None) | _HAS_GAUSS * self._gauss)
+        food = self.food or (0, 0)
+        header = _SNAPSHOT.pack(SNAPSHOT_VERSION, cols, rows, _DIRECTION_NAMES.index(self.direction),
+                                _DIRECTION_NAMES.index(self._last_moved), flags, self.pending_growth, self.score,
+                                self.ticks, food[0], food[1], self.seed or 0, len(self.body))
+        return b"".join((header, array("H", chain.from_iterable(self.body)).tobytes(), self._rng_state))
+
+    def restore(self, data: bytes) -> None:
+        """Sets the game state to a snapshot taken on an engine with the same grid size. The free cells are rebuilt
+         in the order reset leaves them in, so a restored game always continues the same way, but food placed after
+         the restore can land elsewhere than it did in the game the snapshot was taken of."""
+        (version, cols, rows, direction, last_moved, flags, pending_growth, score, ticks, food_x, food_y, seed,
+         length) = _SNAPSHOT.unpack_from(data)
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version: {version}.")
+        if (cols, rows) != self.grid_size:
+            raise ValueError(f"Snapshot of a {cols}x{rows} board does not fit the {self.grid_size[0]}x"
+                             f"{self.grid_size[1]} board.")
+        offset = _SNAPSHOT.size
+        cells = array("H")
+        cells.frombytes(data[offset:offset + length * 2 * cells.itemsize])
+        offset += length * 2 * cells.itemsize
+        rng_state = bytes(data[offset:])
+        # the random state is often unchanged when rolling back a few ticks
+        if rng_state != self._rng_state or bool(flags & _HAS_GAUSS) != self._gauss:
+            internal = array("I")
+            internal.frombytes(rng_state[:-8])
+            gauss, = struct.unpack("<d", rng_state[-8:])
+            self._gauss = bool(flags & _HAS_GAUSS)
+            self.rng.setstate((_RNG_VERSION, tuple(internal), gauss if self._gauss else None))
+            self._rng_state = rng_state
+
+        self.body = deque(zip(cells[::2], cells[1::2]))
+        self._clear_board()
+        for x, y in self.body:
+            self._occupy(y * cols + x)
+        self.direction = _DIRECTION_NAMES[direction]
+        self._last_moved = _DIRECTION_NAMES[last_moved]
+        self.pending_growth = pending_growth
+        self.score = score
+        self.ticks = ticks
+        self.food = (food_x, food_y) if flags & _HAS_FOOD else None
+        self.seed = seed if flags & _HAS_SEED else None
+        self.game_over = bool(flags & _GAME_OVER)
+        self.won = bool(flags & _WON)
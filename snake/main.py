@@ -1,10 +1,32 @@
-from snakegame import SnakeGame
+import argparse
+
+from profiler import StartupProfiler
 
 
 def main() -> None:
+    startup = StartupProfiler()
+    parser = argparse.ArgumentParser(description="Plays the snake game.")
+    parser.add_argument("--profile-output", default=None,
+                        help="CSV or JSON file to write the frame timings of the last frames to on exit")
+    parser.add_argument("--grid-size", type=int, nargs=2, default=None, metavar=("COLUMNS", "ROWS"),
+                        help="board size in tiles, a board larger than the window scrolls with the snake")
+    parser.add_argument("--autopilot", action="store_true",
+                        help="let the autopilot play in demo mode, press F2 or a direction key to take over")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="print the time spent in each phase of the startup once the first frame is drawn")
+    args = parser.parse_args()
+
+    from snakegame import SnakeGame  # imported after parsing, so --help is fast and the import is profiled
+    startup.lap("imports")
     game = SnakeGame(screen_size=(640, 480),
                      title="Snake",
-                     fps=11)
+                     tick_rate=11,
+                     render_fps=60,
+                     replay_dir="replays",
+                     profile_path=args.profile_output,
+                     grid_size=tuple(args.grid_size) if args.grid_size else None,
+                     autopilot=args.autopilot,
+                     startup_profiler=startup if args.startup_profile else None)
     game.run()
 
 
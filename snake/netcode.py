@@ -0,0 +1,244 @@
+import asyncio
+import struct
+import zlib
+from collections import deque
+from enum import IntEnum
+
+from arena import MOVE_ATE, ArenaEngine, ArenaSnake, Event
+from engine import direction_between
+from queue_handler import DIRECTION_NAMES
+
+# Messages are framed by their length and start with their type. Ticks only carry the events of the tick, so
+# their size depends on the number of snakes and not on the board size or snake lengths. Full snapshots are only
+# sent to clients when they join.
+_LENGTH = struct.Struct("<I")
+_TYPE = struct.Struct("<B")
+_WELCOME = struct.Struct("<BBHHH")  # type, player id, columns, rows, tick rate
+_SNAPSHOT = struct.Struct("<BIHH")  # type, frame, number of snakes, number of food cells
+_SNAPSHOT_SNAKE = struct.Struct("<BBBII")  # player id, alive, direction index, score, length
+_TICK = struct.Struct("<BIIH")  # type, frame, checksum of the board, number of events
+_INPUT = struct.Struct("<BIB")  # type, frame the input was made on, direction index
+_MOVE = struct.Struct("<BBHHB")  # event kind, player id, head column, head row, move flags
+_PLAYER_EVENT = struct.Struct("<BB")  # event kind, player id
+_FOOD_EVENT = struct.Struct("<BHH")  # event kind, column, row
+_SPAWN = struct.Struct("<BBBH")  # event kind, player id, direction index, length, followed by the cells
+_CELL = struct.Struct("<HH")
+
+MAX_MESSAGE_SIZE = 64 * 1024 * 1024  # larger messages are invalid, so a broken peer cannot exhaust memory
+
+
+class Message(IntEnum):
+    """Types of messages."""
+    WELCOME = 1  # server to client, sent once after joining, followed by a snapshot
+    SNAPSHOT = 2  # server to client, the full arena
+    TICK = 3  # server to client, the events of a step
+    JOIN = 10  # client to server
+    INPUT = 11  # client to server, a turn
+
+
+class EventKind(IntEnum):
+    """Kinds of events in tick messages, by the event kind names of the arena."""
+    MOVE = 1
+    DIE = 2
+    LEAVE = 3
+    SPAWN = 4
+    FOOD_ADD = 5
+    FOOD_REMOVE = 6
+    TAIL = 7
+
+
+def frame(payload: bytes) -> bytes:
+    """Returns the message with its length in front of it."""
+    return _LENGTH.pack(len(payload)) + payload
+
+
+async def read_message(reader: asyncio.StreamReader) -> bytes:
+    """Returns the next message without its length. Raises asyncio.IncompleteReadError when the
+     connection is closed."""
+    length, = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+    if length > MAX_MESSAGE_SIZE:
+        raise ValueError(f"Message of {length} bytes is too large.")
+    return await reader.readexactly(length)
+
+
+def message_type(payload: bytes) -> Message:
+    """Returns the type of a message."""
+    return Message(payload[0])
+
+
+def pack_cells(cells) -> bytes:
+    """Returns the (column, row) cells packed as pairs of unsigned shorts."""
+    flat = [value for cell in cells for value in cell]
+    return struct.pack(f"<{len(flat)}H", *flat)
+
+
+def unpack_cells(data: bytes, offset: int, count: int) -> list[tuple[int, int]]:
+    """Returns count cells packed by pack_cells, starting at the offset."""
+    flat = struct.unpack_from(f"<{2 * count}H", data, offset)
+    return list(zip(flat[::2], flat[1::2]))
+
+
+def encode_welcome(player: int, grid_size: tuple[int, int], tick_rate: int) -> bytes:
+    return frame(_WELCOME.pack(Message.WELCOME, player, grid_size[0], grid_size[1], tick_rate))
+
+
+def decode_welcome(payload: bytes) -> tuple[int, tuple[int, int], int]:
+    """Returns the player id, grid size and tick rate of a welcome message."""
+    _, player, cols, rows, tick_rate = _WELCOME.unpack(payload)
+    return player, (cols, rows), tick_rate
+
+
+def encode_snapshot(arena: ArenaEngine) -> bytes:
+    """Returns a message with the full arena, dead snakes included."""
+    parts = [_SNAPSHOT.pack(Message.SNAPSHOT, arena.frame, len(arena.snakes), len(arena.food))]
+    for snake in arena.snakes.values():
+        parts.append(_SNAPSHOT_SNAKE.pack(snake.player, snake.alive, DIRECTION_NAMES.index(snake.direction),
+                                          snake.score, len(snake.body)))
+        parts.append(pack_cells(snake.body))
+    parts.append(pack_cells(arena.food))
+    return frame(b"".join(parts))
+
+
+def board_checksum(owners: bytearray) -> int:
+    """Returns the checksum of the board cells the clients compare their copy of the arena with."""
+    return zlib.crc32(owners)
+
+
+def encode_tick(frame_number: int, checksum: int, events: list[Event]) -> bytes:
+    """Returns a message with the events of a step."""
+    parts = [_TICK.pack(Message.TICK, frame_number, checksum, len(events))]
+    for event in events:
+        match event.kind:
+            case "move":
+                parts.append(_MOVE.pack(EventKind.MOVE, event.player, *event.cell, event.flags))
+            case "tail":
+                parts.append(_PLAYER_EVENT.pack(EventKind.TAIL, event.player))
+            case "die":
+                parts.append(_PLAYER_EVENT.pack(EventKind.DIE, event.player))
+            case "leave":
+                parts.append(_PLAYER_EVENT.pack(EventKind.LEAVE, event.player))
+            case "spawn":
+                parts.append(_SPAWN.pack(EventKind.SPAWN, event.player, DIRECTION_NAMES.index(event.direction),
+                                         len(event.cells)))
+                parts.append(pack_cells(event.cells))
+            case "food_add":
+                parts.append(_FOOD_EVENT.pack(EventKind.FOOD_ADD, *event.cell))
+            case "food_remove":
+                parts.append(_FOOD_EVENT.pack(EventKind.FOOD_REMOVE, *event.cell))
+            case _:
+                raise ValueError(f"Invalid event kind: '{event.kind}'.")
+    return frame(b"".join(parts))
+
+
+def encode_join() -> bytes:
+    return frame(_TYPE.pack(Message.JOIN))
+
+
+def encode_input(frame_number: int, direction: str) -> bytes:
+    return frame(_INPUT.pack(Message.INPUT, frame_number, DIRECTION_NAMES.index(direction)))
+
+
+def decode_input(payload: bytes) -> tuple[int, int]:
+    """Returns the frame and direction index of an input message."""
+    _, frame_number, direction = _INPUT.unpack(payload)
+    if direction >= len(DIRECTION_NAMES):
+        raise ValueError(f"Invalid direction index: {direction}.")
+    return frame_number, direction
+
+
+class ArenaMirror:
+    """Copy of the arena on a client, built from the snapshot sent on joining and kept up to date with
+     the events of every tick. Applying a tick costs the same for any board size and snake length."""
+
+    def __init__(self, grid_size: tuple[int, int]) -> None:
+        self.grid_size = grid_size
+        self.owners = bytearray(grid_size[0] * grid_size[1])  # player id covering each cell by row, 0 if free
+        self.snakes: dict[int, ArenaSnake] = {}
+        self.food: set[tuple[int, int]] = set()
+        self.frame = 0  # frame of the last applied message
+        self.checksum_errors = 0  # number of ticks after which the copy differed from the server's arena
+        self.verify = False  # compares the board with the checksum of every tick, which costs time on large boards
+
+    def apply(self, payload: bytes) -> None:
+        """Applies a snapshot or tick message."""
+        match message_type(payload):
+            case Message.SNAPSHOT:
+                self._apply_snapshot(payload)
+            case Message.TICK:
+                self._apply_tick(payload)
+            case kind:
+                raise ValueError(f"Unexpected message: {kind.name}.")
+
+    def _apply_snapshot(self, payload: bytes) -> None:
+        cols = self.grid_size[0]
+        _, self.frame, snake_count, food_count = _SNAPSHOT.unpack_from(payload)
+        offset = _SNAPSHOT.size
+        self.owners[:] = bytes(len(self.owners))
+        self.snakes.clear()
+        for _ in range(snake_count):
+            player, alive, direction, score, length = _SNAPSHOT_SNAKE.unpack_from(payload, offset)
+            offset += _SNAPSHOT_SNAKE.size
+            snake = self.snakes[player] = ArenaSnake(player)
+            snake.alive = bool(alive)
+            snake.direction = DIRECTION_NAMES[direction]
+            snake.score = score
+            snake.body = deque(unpack_cells(payload, offset, length))
+            offset += length * _CELL.size
+            for x, y in snake.body:
+                self.owners[y * cols + x] = player
+        self.food = set(unpack_cells(payload, offset, food_count))
+
+    def _apply_tick(self, payload: bytes) -> None:
+        cols = self.grid_size[0]
+        owners = self.owners
+        _, self.frame, checksum, event_count = _TICK.unpack_from(payload)
+        offset = _TICK.size
+        for _ in range(event_count):
+            kind = payload[offset]
+            if kind == EventKind.TAIL:
+                _, player = _PLAYER_EVENT.unpack_from(payload, offset)
+                offset += _PLAYER_EVENT.size
+                # the tails of a tick are freed before any head moves, as on the server
+                tail_x, tail_y = self.snakes[player].body.pop()
+                owners[tail_y * cols + tail_x] = 0
+            elif kind == EventKind.MOVE:
+                _, player, x, y, flags = _MOVE.unpack_from(payload, offset)
+                offset += _MOVE.size
+                snake = self.snakes[player]
+                snake.direction = direction_between(snake.body[0], (x, y), self.grid_size) or snake.direction
+                snake.body.appendleft((x, y))
+                owners[y * cols + x] = player
+                snake.score += bool(flags & MOVE_ATE)
+            elif kind == EventKind.DIE or kind == EventKind.LEAVE:
+                _, player = _PLAYER_EVENT.unpack_from(payload, offset)
+                offset += _PLAYER_EVENT.size
+                # players that left before a snapshot was made may still have events in the next tick
+                if (snake := self.snakes.get(player)) is not None:
+                    for x, y in snake.body:
+                        owners[y * cols + x] = 0
+                    snake.body.clear()
+                    snake.alive = False
+                    if kind == EventKind.LEAVE:
+                        del self.snakes[player]
+            elif kind == EventKind.SPAWN:
+                _, player, direction, length = _SPAWN.unpack_from(payload, offset)
+                offset += _SPAWN.size
+                snake = self.snakes.setdefault(player, ArenaSnake(player))
+                snake.body = deque(unpack_cells(payload, offset, length))
+                offset += length * _CELL.size
+                snake.direction = DIRECTION_NAMES[direction]
+                snake.score = 0
+                snake.alive = True
+                for x, y in snake.body:
+                    owners[y * cols + x] = player
+            elif kind == EventKind.FOOD_ADD or kind == EventKind.FOOD_REMOVE:
+                _, x, y = _FOOD_EVENT.unpack_from(payload, offset)
+                offset += _FOOD_EVENT.size
+                if kind == EventKind.FOOD_ADD:
+                    self.food.add((x, y))
+                else:
+                    self.food.discard((x, y))
+            else:
+                raise ValueError(f"Invalid event kind: {kind}.")
+        if self.verify and board_checksum(owners) != checksum:
+            self.checksum_errors += 1
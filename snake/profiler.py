@@ -0,0 +1,138 @@
+import csv
+import json
+import time
+from array import array
+from enum import IntEnum
+
+
+class Phase(IntEnum):
+    """Phases of a frame of the game loop that are timed."""
+    EVENTS = 0  # polling and handling pygame events
+    COMMAND = 1  # applying queued commands
+    STEP = 2  # the engine step
+    SPRITES = 3  # moving the sprites after a step
+    EAT = 4  # scores, food and sounds after eating
+    RENDER = 5  # interpolating and drawing the screen
+
+
+PHASE_NAMES = tuple(phase.name.lower() for phase in Phase)
+
+
+class FrameProfiler:
+    """Records how long each phase of the last frames took, in a fixed-size ring buffer of seconds.
+     A frame is started with begin_frame, and each lap call adds the time since the previous lap
+     or the frame start to a phase. Ticks run several times in a frame add up in the same phases."""
+
+    def __init__(self, capacity: int = 600) -> None:
+        if capacity < 1:
+            raise ValueError("Capacity must be at least 1.")
+        self.capacity = capacity
+        self._phases = array("d", [0.0] * (capacity * len(Phase)))  # one row of phase durations per frame
+        self._totals = array("d", [0.0] * capacity)  # whole frame durations, including untimed work
+        self._frame = 0  # number of the current frame, its row is frame % capacity
+        self._frame_start = 0.0
+        self._last = 0.0  # time of the last lap
+
+    def __len__(self) -> int:
+        """Returns the number of finished frames in the buffer."""
+        return min(self._frame, self.capacity)
+
+    @property
+    def frame(self) -> int:
+        """Returns the number of frames finished since the profiler was made."""
+        return self._frame
+
+    def begin_frame(self) -> None:
+        """Starts timing a new frame and clears its row."""
+        offset = self._frame % self.capacity * len(Phase)
+        for i in range(len(Phase)):
+            self._phases[offset + i] = 0.0
+        self._frame_start = self._last = time.perf_counter()
+
+    def mark(self) -> None:
+        """Starts the next lap now, so the time since the last lap is not added to any phase."""
+        self._last = time.perf_counter()
+
+    def lap(self, phase: Phase) -> None:
+        """Adds the time since the last lap to the given phase of the current frame."""
+        now = time.perf_counter()
+        self._phases[self._frame % self.capacity * len(Phase) + phase] += now - self._last
+        self._last = now
+
+    def end_frame(self) -> None:
+        """Records the duration of the current frame and moves on to the next row."""
+        self._totals[self._frame % self.capacity] = time.perf_counter() - self._frame_start
+        self._frame += 1
+
+    def rows(self) -> list[tuple[int, float, list[float]]]:
+        """Returns the (frame number, frame duration, phase durations) of the buffered frames, oldest first."""
+        rows = []
+        for frame in range(self._frame - len(self), self._frame):
+            index = frame % self.capacity
+            offset = index * len(Phase)
+            rows.append((frame, self._totals[index], list(self._phases[offset:offset + len(Phase)])))
+        return rows
+
+    def percentiles(self, *percents: float) -> dict[str, list[float]]:
+        """Returns the given percentiles in seconds of each phase and of the whole frame ('frame')
+         over the buffered frames."""
+        rows = self.rows()
+        columns = {"frame": [total for _, total, _ in rows]}
+        for phase in Phase:
+            columns[PHASE_NAMES[phase]] = [durations[phase] for _, _, durations in rows]
+        result = {}
+        for name, values in columns.items():
+            values.sort()
+            result[name] = [values[min(len(values) - 1, int(len(values) * percent / 100))] if values else 0.0
+                            for percent in percents]
+        return result
+
+    def save(self, path: str) -> None:
+        """Writes the buffered frames in milliseconds to a CSV file, or a JSON file if the path ends with .json."""
+        header = ["frame", "total_ms", *(f"{name}_ms" for name in PHASE_NAMES)]
+        records = [[frame, total * 1000, *(duration * 1000 for duration in durations)]
+                   for frame, total, durations in self.rows()]
+        with open(path, "w", newline="") as f:
+            if path.endswith(".json"):
+                json.dump([dict(zip(header, record)) for record in records], f, indent=2)
+            else:
+                writer = csv.writer(f)
+                writer.writerow(header)
+                writer.writerows(records)
+
+
+class StartupProfiler:
+    """Records how long each phase of the startup took, from the time the profiler is made. Each lap call
+     adds the time since the previous lap as a phase. Work done in the background at the same time is added
+     with add, it overlaps the laps and does not count towards the total."""
+
+    def __init__(self) -> None:
+        self.start = self._last = time.perf_counter()
+        self.phases: list[tuple[str, float]] = []  # (name, seconds) of the laps in order
+        self.background: list[tuple[str, float]] = []  # (name, seconds) of the background work
+
+    def lap(self, name: str) -> None:
+        """Adds the time since the last lap as a phase with the given name."""
+        now = time.perf_counter()
+        self.phases.append((name, now - self._last))
+        self._last = now
+
+    def add(self, name: str, seconds: float) -> None:
+        """Adds the duration of background work. Is thread safe."""
+        self.background.append((name, seconds))
+
+    @property
+    def total(self) -> float:
+        """Returns the seconds from the start to the last lap."""
+        return self._last - self.start
+
+    def report(self) -> str:
+        """Returns a table of the phases in milliseconds."""
+        width = max((len(name) for name, _ in self.phases + self.background), default=0) + 2
+        lines = ["Startup profile:"]
+        lines += [f"  {name:<{width}}{seconds * 1000:8.1f} ms" for name, seconds in self.phases]
+        lines += [f"  {name + ' *':<{width}}{seconds * 1000:8.1f} ms" for name, seconds in self.background]
+        lines.append(f"  {'total':<{width}}{self.total * 1000:8.1f} ms")
+        if self.background:
+            lines.append("  * in the background during the phases above")
+        return "\n".join(lines)
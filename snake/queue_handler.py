@@ -1,30 +1,89 @@
-class Queue:
-    """Class that represents actions that are queued for a number of following frames."""
-
-    def __init__(self):
-        # maps number of queued frames to a dict mapping objects to actions to be executed on that object:
-        self.queue = {}
-
-    def add(self, no_frames: int, obj_actions: list[tuple[object, str]]) -> None:
-        """Queue actions to be executed after the given number of frames on given objects.
-         Actions are string statements that will be executed."""
-        if self.queue.get(no_frames) is None:
-            self.queue[no_frames] = obj_actions
-        self.queue[no_frames] += obj_actions
-
-    def handle(self) -> None:
-        """Handles the queue."""
-        if (obj_actions := self.queue.get(0)) is None:
-            return
-        for obj, action in obj_actions:
-            exec(f"obj.{action}")
-        del self.queue[0]
-
-    def update(self):
-        """Updates the queue by decreasing the number of frames for each action."""
-        if not self.queue:  # empty queue
-            return
-        new_queue = {}
-        for key, val in self.queue.items():
-            new_queue[key - 1] = val
-        self.queue = new_queue
+import struct
+from array import array
+from enum import IntEnum
+
+from engine import DIRECTIONS
+
+DIRECTION_NAMES = tuple(DIRECTIONS)  # command arguments for turns are indices into this tuple
+_SNAPSHOT = struct.Struct("<HHH")  # capacity, index of the oldest command and number of commands
+
+
+class Command(IntEnum):
+    """Types of commands that can be queued."""
+    TURN = 1  # argument is a direction index
+
+
+class CommandQueue:
+    """Fixed-size ring buffer of typed commands, each stamped with the tick it is applied on.
+     At most one command is applied per tick, later commands are buffered for the following ticks.
+     The storage is allocated once, so queueing and handling commands costs the same every frame."""
+
+    def __init__(self, capacity: int = 8, depth: int = 2) -> None:
+        if capacity < 1 or not 1 <= depth <= capacity:
+            raise ValueError("Capacity must be at least 1 and depth between 1 and the capacity.")
+        self.capacity = capacity
+        self.depth = depth  # number of ticks ahead commands can be buffered, later ones are dropped
+        self._ticks = array("q", [0] * capacity)
+        self._commands = bytearray(capacity)
+        self._args = bytearray(capacity)
+        self._start = 0  # index of the oldest command
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, tick: int, command: Command, arg: int = 0) -> bool:
+        """Queues a command to be applied on the given tick, or on the first later tick that has no command.
+         Returns False if the command was dropped because the buffer is full or too far ahead."""
+        stamp = tick
+        if self._size:
+            last = (self._start + self._size - 1) % self.capacity
+            stamp = max(tick, self._ticks[last] + 1)
+        if self._size == self.capacity or stamp - tick >= self.depth:
+            return False
+        index = (self._start + self._size) % self.capacity
+        self._ticks[index] = stamp
+        self._commands[index] = command
+        self._args[index] = arg
+        self._size += 1
+        return True
+
+    def pop(self, tick: int) -> tuple[Command, int] | None:
+        """Removes and returns the (command, argument) of the oldest command if it is due on the given tick.
+         Commands that were due on earlier ticks are returned as well."""
+        if not self._size or self._ticks[self._start] > tick:
+            return None
+        index = self._start
+        self._start = (self._start + 1) % self.capacity
+        self._size -= 1
+        return Command(self._commands[index]), self._args[index]
+
+    def items(self) -> list[tuple[int, Command, int]]:
+        """Returns the queued (tick, command, argument) entries from the oldest to the newest."""
+        indices = ((self._start + i) % self.capacity for i in range(self._size))
+        return [(self._ticks[i], Command(self._commands[i]), self._args[i]) for i in indices]
+
+    def clear(self) -> None:
+        """Removes all queued commands."""
+        self._start = 0
+        self._size = 0
+
+    def snapshot(self) -> bytes:
+        """Returns the queued commands in a binary form that restore takes back, a copy of the whole buffer."""
+        return b"".join((_SNAPSHOT.pack(self.capacity, self._start, self._size), self._ticks.tobytes(),
+                         self._commands, self._args))
+
+    def restore(self, data: bytes) -> None:
+        """Sets the queued commands to a snapshot taken on a queue with the same capacity."""
+        capacity, start, size = _SNAPSHOT.unpack_from(data)
+        if capacity != self.capacity:
+            raise ValueError(f"Snapshot of a queue of {capacity} commands does not fit a queue of {self.capacity}.")
+        offset = _SNAPSHOT.size
+        ticks = array("q")
+        ticks.frombytes(data[offset:offset + capacity * ticks.itemsize])
+        offset += capacity * ticks.itemsize
+        self._ticks = ticks
+        self._commands = bytearray(data[offset:offset + capacity])
+        self._args = bytearray(data[offset + capacity:offset + 2 * capacity])
+        self._start = start
+        self._size = size
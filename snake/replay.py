@@ -0,0 +1,160 @@
+import argparse
+import struct
+import time
+
+from engine import SEED_LIMIT, SnakeEngine
+from queue_handler import DIRECTION_NAMES
+
+MAGIC = b"SNKR"
+VERSION = 1
+# magic, version, columns, rows, max food distance, seed, ticks, score, number of inputs
+_HEADER = struct.Struct("<4sBHHHQIII")
+_INPUT = struct.Struct("<IB")  # tick, direction index
+
+
+class Replay:
+    """Class that records one game as its seed and the direction inputs applied on each tick.
+     The engine is deterministic, so these are enough to reproduce the game exactly."""
+
+    def __init__(self,
+                 grid_size: tuple[int, int],
+                 max_food_dist: int,
+                 seed: int,
+                 inputs: list[tuple[int, int]] = None,
+                 ticks: int = 0,
+                 score: int = 0) -> None:
+        if not 0 <= seed < SEED_LIMIT:
+            raise ValueError(f"Seed must be between 0 and {SEED_LIMIT - 1}.")
+        self.grid_size = grid_size
+        self.max_food_dist = max_food_dist
+        self.seed = seed
+        self.inputs = inputs if inputs is not None else []  # (tick, direction index) in tick order
+        self.ticks = ticks  # number of ticks the game lasted
+        self.score = score  # score at the end of the recording
+
+    def add(self, tick: int, direction: int) -> None:
+        """Records a direction input applied on the given tick."""
+        self.inputs.append((tick, direction))
+
+    def finish(self, engine: SnakeEngine) -> None:
+        """Records the length and score of the game from the engine it was played on."""
+        self.ticks = engine.ticks
+        self.score = engine.score
+
+    def new_engine(self) -> SnakeEngine:
+        """Returns an engine at the start of the recorded game."""
+        engine = SnakeEngine(self.grid_size, self.max_food_dist)
+        engine.reset(seed=self.seed)
+        return engine
+
+    def to_bytes(self) -> bytes:
+        """Returns the replay in its binary format."""
+        header = _HEADER.pack(MAGIC, VERSION, *self.grid_size, self.max_food_dist, self.seed,
+                              self.ticks, self.score, len(self.inputs))
+        return header + b"".join(_INPUT.pack(tick, direction) for tick, direction in self.inputs)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Replay":
+        """Returns the replay stored in the given binary data."""
+        if len(data) < _HEADER.size:
+            raise ValueError("Replay data is too short.")
+        magic, version, cols, rows, max_food_dist, seed, ticks, score, count = _HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("Not a replay file.")
+        if version != VERSION:
+            raise ValueError(f"Unsupported replay version: {version}.")
+        if len(data) != _HEADER.size + count * _INPUT.size:
+            raise ValueError("Replay data is truncated.")
+        inputs = list(_INPUT.iter_unpack(data[_HEADER.size:]))
+        return cls((cols, rows), max_food_dist, seed, inputs, ticks, score)
+
+    def save(self, path: str) -> None:
+        """Writes the replay to a file."""
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str) -> "Replay":
+        """Reads a replay from a file."""
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+
+class ReplayPlayer:
+    """Class that plays a replay back on a headless engine, as fast as the CPU allows."""
+
+    def __init__(self, replay: Replay) -> None:
+        self.replay = replay
+        self._inputs = dict(replay.inputs)  # maps ticks to direction indices
+        self.engine = replay.new_engine()
+
+    @property
+    def tick(self) -> int:
+        """Returns the number of ticks played."""
+        return self.engine.ticks
+
+    @property
+    def finished(self) -> bool:
+        """Returns True if the whole recording has been played."""
+        return self.engine.game_over or self.engine.ticks >= self.replay.ticks
+
+    def direction_at(self, tick: int) -> str | None:
+        """Returns the direction input recorded for the given tick, if any."""
+        direction = self._inputs.get(tick)
+        return None if direction is None else DIRECTION_NAMES[direction]
+
+    def step(self) -> tuple[int, bool]:
+        """Plays the next tick of the recording. Returns the reward and if the game is over."""
+        return self.engine.step(self.direction_at(self.engine.ticks))
+
+    def seek(self, tick: int) -> None:
+        """Moves the playback to the state after the given number of ticks. Seeking backwards replays
+         the recording from the start."""
+        if tick < self.engine.ticks:
+            self.engine = self.replay.new_engine()
+        while self.engine.ticks < tick and not self.finished:
+            self.step()
+
+    def play_to_end(self) -> int:
+        """Plays the rest of the recording and returns the final score."""
+        self.seek(self.replay.ticks)
+        return self.engine.score
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Plays back a recorded snake game.")
+    parser.add_argument("path", help="replay file to play")
+    parser.add_argument("--headless", action="store_true", help="play without a window as fast as possible")
+    parser.add_argument("--seek", type=int, default=None, help="tick to stop at in headless mode")
+    parser.add_argument("--tick-rate", type=int, default=11, help="ticks per second when viewing")
+    args = parser.parse_args()
+
+    replay = Replay.load(args.path)
+    if args.headless:
+        player = ReplayPlayer(replay)
+        start = time.perf_counter()
+        if args.seek is None:
+            player.play_to_end()
+        else:
+            player.seek(args.seek)
+        elapsed = time.perf_counter() - start
+        print(f"Tick {player.tick}/{replay.ticks}, score {player.engine.score} (recorded {replay.score}),"
+              f" length {player.engine.length}, game over: {player.engine.game_over},"
+              f" {player.tick / max(elapsed, 1e-9):.0f} ticks/s")
+        return
+
+    from snakegame import MAX_SCREEN_SIZE, SnakeGame  # pygame is only needed to view the replay
+    from sprites import TILE_SIZE
+    # boards larger than the largest window are followed by a scrolling view
+    screen_size = (min(replay.grid_size[0] * TILE_SIZE[0], MAX_SCREEN_SIZE[0]),
+                   min(replay.grid_size[1] * TILE_SIZE[1], MAX_SCREEN_SIZE[1]))
+    game = SnakeGame(screen_size=screen_size,
+                     title="Snake replay",
+                     tick_rate=args.tick_rate,
+                     replay=replay,
+                     grid_size=replay.grid_size)
+    game.run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+import bisect
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from typing import NamedTuple
+
+LEADERBOARD_SIZE = 10  # number of top scores kept in memory
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    id INTEGER PRIMARY KEY,
+    score INTEGER NOT NULL,
+    ticks INTEGER NOT NULL,
+    seed TEXT NOT NULL,
+    played_at REAL NOT NULL,
+    session TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scores_by_score ON scores (score DESC, played_at);
+CREATE INDEX IF NOT EXISTS scores_by_session ON scores (session, played_at);
+"""
+
+
+class Score(NamedTuple):
+    """A finished game."""
+    score: int
+    ticks: int
+    seed: int
+    played_at: float  # unix time the game ended
+    session: str  # id of the launch of the game the score was made in
+
+
+def read_env_high_score(path: str) -> int:
+    """Returns the HIGH_SCORE value in a .env file written by older versions of the game, 0 if there is none."""
+    if not os.path.isfile(path):
+        return 0
+    with open(path) as f:
+        for line in f:
+            key, _, value = line.partition("=")
+            if key.strip() == "HIGH_SCORE" and value.strip().isdigit():
+                return int(value)
+    return 0
+
+
+class ScoreStore:
+    """Class that keeps every finished game in an SQLite database. The database is only read when the store
+     is opened, after that the top scores and the scores of this session are kept in memory. Scores are
+     written by a background thread, each in its own transaction, so saving never blocks the game loop and
+     a crash can at most lose the scores that were still queued. Without a path the scores are not saved."""
+
+    def __init__(self,
+                 path: str | None,
+                 leaderboard_size: int = LEADERBOARD_SIZE,
+                 legacy_env_path: str | None = None) -> None:
+        self.path = path
+        self.leaderboard_size = leaderboard_size
+        self.session = uuid.uuid4().hex
+        self.session_scores: list[Score] = []  # scores of this session, oldest first
+        self._leaderboard: list[Score] = []  # highest first, the earliest of equal scores first
+        self._queue: queue.Queue[Score | None] = queue.Queue()
+        self._writer: threading.Thread | None = None
+        if path is None:
+            return
+
+        with sqlite3.connect(path) as connection:
+            connection.executescript(_SCHEMA)
+            if legacy_env_path is not None and connection.execute("SELECT COUNT(*) FROM scores").fetchone()[0] == 0:
+                # keep the high score of older versions as the first score of a new database
+                if high_score := read_env_high_score(legacy_env_path):
+                    connection.execute(*self._insert(Score(high_score, 0, 0, os.path.getmtime(legacy_env_path),
+                                                           "legacy")))
+                    logging.info(f"Imported high score {high_score} from '{legacy_env_path}'.")
+            rows = connection.execute("SELECT score, ticks, seed, played_at, session FROM scores"
+                                      " ORDER BY score DESC, played_at LIMIT ?", (leaderboard_size,))
+            self._leaderboard = [Score(score, ticks, int(seed, 16), played_at, session)
+                                 for score, ticks, seed, played_at, session in rows]
+        connection.close()
+        self._writer = threading.Thread(target=self._write_scores, name="score-writer", daemon=True)
+        self._writer.start()
+
+    @property
+    def high_score(self) -> int:
+        """Returns the highest score ever saved, 0 if there is none."""
+        return self._leaderboard[0].score if self._leaderboard else 0
+
+    def leaderboard(self, count: int | None = None) -> list[Score]:
+        """Returns the given number of highest scores, highest first. Does not read the database."""
+        return self._leaderboard[:count]
+
+    def add(self, score: int, ticks: int, seed: int) -> Score:
+        """Adds the score of a finished game to the leaderboard and the session history at once,
+         and queues it to be written to the database. Returns the added score."""
+        entry = Score(score, ticks, seed, time.time(), self.session)
+        self.session_scores.append(entry)
+        # equal scores stay in the order they were made
+        index = bisect.bisect_right([-s.score for s in self._leaderboard], -score)
+        if index < self.leaderboard_size:
+            self._leaderboard.insert(index, entry)
+            del self._leaderboard[self.leaderboard_size:]
+        if self._writer is not None:
+            self._queue.put(entry)
+        return entry
+
+    def close(self) -> None:
+        """Waits until the queued scores are written and stops the writer thread."""
+        if self._writer is None:
+            return
+        self._queue.put(None)
+        self._writer.join()
+        self._writer = None
+
+    def _write_scores(self) -> None:
+        """Writes the queued scores to the database until None is queued. Runs in the writer thread."""
+        connection = sqlite3.connect(self.path)
+        try:
+            while (entry := self._queue.get()) is not None:
+                try:
+                    with connection:  # commits the insert, or rolls it back on an error
+                        connection.execute(*self._insert(entry))
+                except sqlite3.Error:
+                    logging.exception(f"Could not save score {entry.score} to '{self.path}'.")
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _insert(entry: Score) -> tuple[str, tuple]:
+        """Returns the SQL statement and parameters that insert a score. Seeds are stored as hexadecimal text,
+         because they do not fit in a signed 64-bit integer."""
+        return ("INSERT INTO scores (score, ticks, seed, played_at, session) VALUES (?, ?, ?, ?, ?)",
+                (entry.score, entry.ticks, f"{entry.seed:016x}", entry.played_at, entry.session))
@@ -0,0 +1,173 @@
+import argparse
+import asyncio
+import logging
+import time
+
+from arena import ArenaEngine
+from netcode import (Message, board_checksum, decode_input, encode_snapshot, encode_tick, encode_welcome, message_type,
+                     read_message)
+from queue_handler import DIRECTION_NAMES, Command, CommandQueue
+
+LOG_INTERVAL = 10.0  # seconds between the logged server stats
+
+
+class ArenaServer:
+    """Server running the authoritative arena at a fixed tick rate. Clients send their turns stamped with the
+     frame they were made on, and every tick the server applies the due turns, steps the arena and sends the
+     events of the step to all clients. Turns are buffered per player like the turns of a local game, so at
+     most one is applied per tick and late turns are applied on the next tick."""
+
+    MAX_CLIENT_BUFFER = 256 * 1024  # bytes waiting to be sent to a client before it is dropped as too slow
+    INPUT_DEPTH = 4  # ticks ahead turns of a player are buffered
+
+    def __init__(self, arena: ArenaEngine, tick_rate: int = 11) -> None:
+        self.arena = arena
+        self.tick_rate = tick_rate
+        self._writers: dict[int, asyncio.StreamWriter] = {}  # writers of the joined players by player id
+        self._queues: dict[int, CommandQueue] = {}  # buffered turns by player id
+        self._server: asyncio.Server | None = None
+        # stats since the last log
+        self._ticks = 0
+        self._tick_time = 0.0  # seconds spent stepping the arena and encoding the ticks
+        self._max_tick_time = 0.0
+        self._bytes = 0  # bytes of tick messages sent to one client
+        self._late_ticks = 0  # ticks that started more than a tick late
+
+    @property
+    def players(self) -> int:
+        return len(self._writers)
+
+    async def start(self, host: str = "127.0.0.1", port: int = 5555) -> None:
+        """Starts accepting clients."""
+        self._server = await asyncio.start_server(self._handle_client, host, port)
+
+    @property
+    def port(self) -> int:
+        """Returns the port the server listens on, useful when it was started on port 0."""
+        return self._server.sockets[0].getsockname()[1]
+
+    async def run(self, ticks: int | None = None) -> None:
+        """Runs the ticks, forever or for a number of ticks. Ticks are scheduled from the start time so they do
+         not drift, and the server skips ticks instead of catching up with a burst when it falls behind."""
+        loop = asyncio.get_running_loop()
+        interval = 1 / self.tick_rate
+        next_tick = loop.time()
+        last_log = time.perf_counter()
+        done = 0
+        while ticks is None or done < ticks:
+            next_tick += interval
+            delay = next_tick - loop.time()
+            if delay < -interval:
+                self._late_ticks += 1
+                next_tick = loop.time()
+            await asyncio.sleep(max(0.0, delay))
+            self.tick()
+            done += 1
+            if time.perf_counter() - last_log >= LOG_INTERVAL:
+                self._log_stats()
+                last_log = time.perf_counter()
+
+    def tick(self) -> None:
+        """Applies the due turns, steps the arena and sends the events to all clients."""
+        start = time.perf_counter()
+        arena = self.arena
+        for player, queue in self._queues.items():
+            if (item := queue.pop(arena.frame)) is not None:
+                _, direction = item
+                arena.turn(player, DIRECTION_NAMES[direction])
+        events = arena.step()
+        # every client gets the same bytes, so the message is encoded once
+        message = encode_tick(arena.frame, board_checksum(arena.owners), events)
+        for player, writer in list(self._writers.items()):
+            if writer.transport.get_write_buffer_size() > self.MAX_CLIENT_BUFFER:
+                logging.warning(f"Dropping player {player}, it does not keep up with the ticks.")
+                self._drop(player)
+                continue
+            writer.write(message)
+        elapsed = time.perf_counter() - start
+        self._ticks += 1
+        self._tick_time += elapsed
+        self._max_tick_time = max(self._max_tick_time, elapsed)
+        self._bytes += len(message)
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Adds a player for a client that joins and buffers its turns until it disconnects."""
+        player = None
+        try:
+            if message_type(await read_message(reader)) != Message.JOIN:
+                return
+            player = self.arena.add_player()
+            self._queues[player] = CommandQueue(depth=self.INPUT_DEPTH)
+            # the ticks run on the same loop, so no tick is sent between the snapshot and joining the broadcast
+            writer.write(encode_welcome(player, self.arena.grid_size, self.tick_rate))
+            writer.write(encode_snapshot(self.arena))
+            self._writers[player] = writer
+            logging.info(f"Player {player} joined from {writer.get_extra_info('peername')}.")
+            while True:
+                payload = await read_message(reader)
+                if message_type(payload) != Message.INPUT or player not in self._queues:
+                    break
+                frame_number, direction = decode_input(payload)
+                self._queues[player].add(frame_number, Command.TURN, direction)
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            if player is not None:
+                self._drop(player)
+                logging.info(f"Player {player} left.")
+            writer.close()
+
+    def _drop(self, player: int) -> None:
+        """Removes a player and closes its connection."""
+        if (writer := self._writers.pop(player, None)) is not None:
+            writer.close()
+        if self._queues.pop(player, None) is not None:
+            self.arena.remove_player(player)
+
+    def _log_stats(self) -> None:
+        if self._ticks:
+            logging.info(f"{self.players} players, tick mean {self._tick_time / self._ticks * 1000:.2f} ms, "
+                         f"max {self._max_tick_time * 1000:.2f} ms, {self._bytes / self._ticks:.0f} bytes "
+                         f"per tick per client, {self._late_ticks} late ticks.")
+        self._ticks = self._late_ticks = self._bytes = 0
+        self._tick_time = self._max_tick_time = 0.0
+
+    async def close(self) -> None:
+        """Stops accepting clients and disconnects the joined ones."""
+        for player in list(self._writers):
+            self._drop(player)
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+
+async def serve(host: str, port: int, grid_size: tuple[int, int], tick_rate: int, food_count: int,
+                seed: int | None) -> None:
+    server = ArenaServer(ArenaEngine(grid_size, food_count, seed), tick_rate)
+    await server.start(host, port)
+    logging.info(f"Serving a {grid_size[0]}x{grid_size[1]} arena on {host}:{server.port}.")
+    try:
+        await server.run()
+    finally:
+        await server.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Runs a multiplayer arena server.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on, 0.0.0.0 for the LAN")
+    parser.add_argument("--port", type=int, default=5555)
+    parser.add_argument("--grid-size", type=int, nargs=2, default=(60, 40), metavar=("COLUMNS", "ROWS"))
+    parser.add_argument("--tick-rate", type=int, default=11)
+    parser.add_argument("--food", type=int, default=10, help="number of food cells on the board")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    try:
+        asyncio.run(serve(args.host, args.port, tuple(args.grid_size), args.tick_rate, args.food, args.seed))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
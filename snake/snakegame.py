@@ -1,16 +1,31 @@
 import logging
+import random
+import struct
 import sys
+import threading
+import time
 import os
 
-from dotenv import load_dotenv
 import pygame as pg
 
+import audio
 import sprites
-from queue_handler import Queue
-from tools import get_resource_path, get_sound, play_sound, initialize_env, update_env
+from assets import registry
+from autopilot import Autopilot
+from engine import SnakeEngine, direction_between
+from profiler import FrameProfiler, Phase, StartupProfiler
+from queue_handler import Command, CommandQueue, DIRECTION_NAMES
+from replay import Replay
+from scores import Score, ScoreStore
+from world_view import WorldView
+from tools import get_resource_path
 
 logging.basicConfig(level=logging.INFO)
 
+MAX_SCREEN_SIZE = 896, 640  # size of the background image, larger boards are drawn by a scrolling view
+# current score and size of the command queue snapshot, followed by the queue and engine
+_SNAPSHOT = struct.Struct("<IH")
+
 
 def quit_game() -> None:
     """Quits the pygame and the program."""
@@ -19,7 +34,7 @@ def quit_game() -> None:
 
 
 class SnakeGame:
-    """Class containing snake game logic and data."""
+    """Class containing the pygame window, input and drawing of the snake game. The rules are in SnakeEngine."""
 
     DIRECTION_KEYS = {  # Mapping key presses to directions
         pg.K_UP: "up",
@@ -37,148 +52,255 @@ class SnakeGame:
         pg.K_SPACE: True
     }
 
+    DRAW_LAYERS = {  # Mapping sprite types to the order they are redrawn in dirty regions, lowest first, above the body
+        sprites.Tail: 1,
+        sprites.Food: 2,
+        sprites.Head: 3,
+        sprites.TopBar: 4,
+        sprites.ProfilerOverlay: 5
+    }
+
+    PROFILER_KEY = pg.K_F3  # shows or hides the frame profiler overlay
+    AUTOPILOT_KEY = pg.K_F2  # turns the autopilot on or off
+    DEMO_RESTART_DELAY = 3.0  # seconds the game over screen is shown before the autopilot plays again
+    LEADERBOARD_SIZE = 5  # number of top scores shown on the game over screen
+
     def __init__(self,
                  screen_size: tuple[int, int],
                  title: str,
-                 fps: int) -> None:
-        pg.init()
-        if screen_size[0] > 896 or screen_size[1] > 640:
-            raise ValueError("Maximum image size is 896x640.")
+                 tick_rate: int,
+                 render_fps: int = 60,
+                 interpolate: bool = True,
+                 input_buffer_depth: int = 2,
+                 replay: Replay | None = None,
+                 replay_dir: str | None = None,
+                 profile_path: str | None = None,
+                 score_path: str | None = "scores.db",
+                 grid_size: tuple[int, int] | None = None,
+                 autopilot: bool = False,
+                 startup_profiler: StartupProfiler | None = None) -> None:
+        # only the subsystems the game uses are initialized
+        self.startup = startup_profiler or StartupProfiler()
+        self._report_startup = startup_profiler is not None
+        pg.display.init()
+        pg.font.init()
+        audio.init()
+        self.startup.lap("pygame init")
+        if grid_size is not None:  # the window shrinks to a board smaller than it
+            screen_size = (min(screen_size[0], grid_size[0] * sprites.TILE_SIZE[0]),
+                           min(screen_size[1], grid_size[1] * sprites.TILE_SIZE[1]))
+        if screen_size[0] > MAX_SCREEN_SIZE[0] or screen_size[1] > MAX_SCREEN_SIZE[1]:
+            raise ValueError(f"Maximum image size is {MAX_SCREEN_SIZE[0]}x{MAX_SCREEN_SIZE[1]}.")
         elif screen_size[0] < 290 or screen_size[1] < 290:
             raise ValueError("Minimum image size is 290x290")
         if any((screen_size[i] % sprites.TILE_SIZE[i]) != 0 for i in range(2)):
             raise ValueError(f"Screen sizes must be a multiple of the tile size: '{sprites.TILE_SIZE}'.")
         self.screen_size = screen_size
         self.screen_title = title
-        self.fps = fps
-
-        # Scores
-        self._current_score = 0
-        if os.path.isfile(get_resource_path("../snake/.env")):
-            load_dotenv(get_resource_path("../snake/.env"))
-        else:
-            os.environ["HIGH_SCORE"] = "0"
-            initialize_env()
-        if (hs := os.getenv("HIGH_SCORE")) is None:
-            update_env("HIGH_SCORE", "0")
-            hs = 0
-        self._high_score = int(hs)
+        self.tick_rate = tick_rate  # game logic steps per second
+        self.render_fps = render_fps  # input polling and drawing rate, independent of the tick rate
+        self.interpolate = interpolate  # slide the head and tail between tiles when rendering between ticks
+        self.input_buffer_depth = input_buffer_depth  # number of ticks key presses can be buffered ahead
+        self.replay = replay  # recording to play back instead of reading direction keys
+        self.replay_dir = replay_dir  # folder to save a recording of every game in, None to not save them
+        self.recording: Replay | None = None  # recording of the current game
+        self._replay_inputs = dict(replay.inputs) if replay is not None else {}  # maps ticks to directions
+        self.profile_path = profile_path  # .csv or .json file to write the frame timings to on exit, None to not
+        self.profiler = FrameProfiler()
+        self._profiler_overlay: sprites.ProfilerOverlay | None = None
 
         # Game states
-        self._pause = True  # game starts paused until user presses a button
+        self._pause = not autopilot  # game starts paused until user presses a button, unless it plays itself
         self._game_over = False
-        self._key_pressed = False  # used to prevent multiple key presses per frame
+        self._game_over_time = 0.0
         pg.display.set_caption(self.screen_title)
-        pg.display.set_icon(pg.image.load(get_resource_path(r"..\assets\images\icon.png")))
-
-        # Sound volumes and background music
-        self.sound_volume = 0.5
-        self.music_volume = 0.15
+        pg.display.set_icon(pg.image.load(get_resource_path("../assets/images/icon.png")))
+        self._screen = pg.display.set_mode((self.screen_size[0], self.screen_size[1] + sprites.TILE_SIZE[1]))
+        self.startup.lap("window")
+        self._show_splash()
+        self.startup.lap("splash")
+
+        # Sound effects and background music, the music is streamed while it plays
+        self.audio = audio.Audio(sound_volume=0.5, music_volume=0.15)
         self.music_title = "Abstraction - Three Red Hearts - Connected.wav"
-        self._background_music = get_sound(
-                self.music_title,
-                self.music_volume
+        # the assets are decoded in the background while the rest of the game is set up
+        self._asset_error: BaseException | None = None
+        asset_loader = threading.Thread(target=self._load_assets, name="asset-loader", daemon=True)
+        asset_loader.start()
+
+        # Scores, saved in the background to the score database, None to not save them
+        self._current_score = 0
+        self.scores = ScoreStore(score_path, legacy_env_path=get_resource_path("../snake/.env"))
+        self._high_score = self.scores.high_score
+        self.startup.lap("scores")
+
+        # Game logic, the sprites only draw the engine state
+        self._max_food_dist = 5  # food spawns no closer than 5 tiles from the snake's head
+        window_grid_size = screen_size[0] // sprites.TILE_SIZE[0], screen_size[1] // sprites.TILE_SIZE[1]
+        self.engine = SnakeEngine(
+                grid_size=grid_size or window_grid_size,
+                max_food_dist=self._max_food_dist
         )
+        self.startup.lap("engine")
+        self._wait_for_assets(asset_loader)
+        self.startup.lap("waiting for assets")
+
+        # a board larger than the window is drawn around the head by a scrolling view instead of sprites
+        self.world_view: WorldView | None = None
+        if any(self.engine.grid_size[i] > window_grid_size[i] for i in range(2)):
+            self.world_view = WorldView(self.engine, pg.Rect((0, sprites.TILE_SIZE[1]), screen_size))
 
         self._tail, self._head, self._food, self._top_bar = None, None, None, None
+        self._body = sprites.BodySegments()  # positions of the body parts from the neck to the tail
+        self._prev_tail_pos = None  # tail position before the last tick, for interpolation
+        self._trailing_body = False  # the last body part covers the tail's cell until the sliding tail reaches it
+        # Dirty rectangle rendering: only the regions that changed since the last frame are redrawn
+        self._dirty_rects: list[pg.rect.Rect] = []
+        self._dirty_sprites: dict[pg.sprite.Sprite, None] = {}  # ordered set of sprites to redraw
+        self._dirty_body: list[pg.rect.Rect] = []  # rects of the body parts to redraw, below the sprites
+        self._redraw_all = True  # redraw the whole screen, for example when an overlay is shown or hidden
         self._initialize_sprites()
+        self.startup.lap("sprites")
 
         self._pause_screen = None
+        # plays the game in demo mode, it queues its turns like key presses
+        self.autopilot = Autopilot(self.engine) if autopilot else None
+
+    def _show_splash(self) -> None:
+        """Draws the first frame while the assets are loading."""
+        self._screen.fill(sprites.BACKGROUND_COLOR)
+        loading = registry.text(sprites.FONT, 40, "Loading...", "white")
+        self._screen.blit(loading, loading.get_rect(center=self._screen.get_rect().center))
+        pg.display.flip()
+
+    def _load_assets(self) -> None:
+        """Decodes the images and sounds and opens the music. Runs in the asset loader thread."""
+        start = time.perf_counter()
+        try:
+            # decode and convert the images, the display format is known once the window is made
+            registry.preload(sprites.IMAGES, sprites.ORIENTED_IMAGES)
+            self.audio.preload(audio.SOUNDS)
+            self.audio.load_music(self.music_title)
+        except BaseException as e:  # raised again in the main thread
+            self._asset_error = e
+        self.startup.add("assets", time.perf_counter() - start)
+
+    def _wait_for_assets(self, asset_loader: threading.Thread) -> None:
+        """Waits for the asset loader thread, keeping the window responsive meanwhile."""
+        while asset_loader.is_alive():
+            pg.event.pump()
+            asset_loader.join(0.01)
+        if self._asset_error is not None:
+            raise self._asset_error
 
     def _initialize_sprites(self):
-        x, y = self.screen_size[0] // 2 - sprites.TILE_SIZE[0], self.screen_size[1] // 2
-        self._tail = sprites.Tail((x - sprites.TILE_SIZE[0], y))
-        self._head = sprites.Head((x, y), prev_segment=self._tail)
+        seed = self.replay.seed if self.replay is not None else random.getrandbits(64)
+        self.engine.reset(seed=seed)
+        self.recording = Replay(self.engine.grid_size, self.engine.max_food_dist, seed)
+        self._build_sprites()
+        self.queue = CommandQueue(depth=self.input_buffer_depth)  # queue for storing moves and key presses
+
+    def _build_sprites(self) -> None:
+        """Creates the sprites of the current engine state."""
+        cells = self.engine.body
+        self._body.clear()
+        self._trailing_body = False
+        if self.world_view is None:  # the world view draws the body itself
+            for cell in reversed(list(cells)[1:-1]):  # added from the tail, so the neck ends up first
+                self._body.appendleft(sprites.cell_to_pos(cell))
         self._top_bar = sprites.TopBar(
                 current_score=self._current_score,
                 high_score=self._high_score,
                 size=(self.screen_size[0], sprites.TILE_SIZE[1]),
         )
-        self.snake_segments = []
-
-        # Create food sprite at random position no closer than 5 tiles from the snake's head.
-        self._max_food_dist = 5
-        self._food = sprites.Food(
-                screen_size=self.screen_size,
-                max_dist=self._max_food_dist,
-                head_pos=self._head.pos)
         self._sprite_group = sprites.SpriteGroup()
-
-        # add to sprite group and snake_segment list
-        self._add_sprites([self._head, self._tail, self._food, self._top_bar])
-        self.queue = Queue()  # queue for storing moves and key presses
+        if self.world_view is None:
+            tail_direction = direction_between(cells[-1], cells[-2], self.engine.grid_size) or "right"
+            self._tail = sprites.Tail(sprites.cell_to_pos(self.engine.tail), direction=tail_direction)
+            self._head = sprites.Head(sprites.cell_to_pos(self.engine.head), direction=self.engine.direction)
+            # a full redraw draws the group in the order the sprites were added, so they are added in the order
+            # of DRAW_LAYERS the dirty regions are redrawn in
+            # noinspection PyTypeChecker
+            self._sprite_group.add(self._tail)
+            if self.engine.food is not None:
+                self._food = sprites.Food(sprites.cell_to_pos(self.engine.food))
+                # noinspection PyTypeChecker
+                self._sprite_group.add(self._food)
+            # noinspection PyTypeChecker
+            self._sprite_group.add(self._head)
+        else:
+            self.world_view.reset()
+        # noinspection PyTypeChecker
+        self._sprite_group.add(self._top_bar)
+        if self._profiler_overlay is not None and self._profiler_overlay.alive():
+            self._profiler_overlay.kill()  # move the overlay from the old group, it stays shown after a restart
+            # noinspection PyTypeChecker
+            self._sprite_group.add(self._profiler_overlay)
+        self._prev_tail_pos = None
+        self._redraw_all = True
 
     @property
     def snake_length(self) -> int:
         """Returns the length of the snake."""
-        return len(self.snake_segments)
-
-    def _add_sprites(self, sprite_list: list[sprites.SnakeSegment | sprites.Food]) -> None:
-        """Add given sprites to the sprite group and list."""
-        # noinspection PyTypeChecker
-        self._sprite_group.add(sprite_list)
-        # dont add food to snake_segment list
-        self.snake_segments += [sprite for sprite in sprite_list if isinstance(sprite, sprites.SnakeSegment)]
+        return self.engine.length
 
     def grow(self, amount: int = 1) -> None:
-        """Grows the snake by a given amount of body parts."""
-        # noinspection PyPropertyAccess
-        if amount < 0:
-            raise ValueError("Growing amount must be greater than 0.")
-        if amount == 0:
-            return
-        size = sprites.TILE_SIZE
-
-        # move the tail
-        self._tail = self.snake_segments.pop()
-        movement_values = {
-            "right": (-amount * size[0], 0),
-            "left": (amount * size[0], 0),
-            "up": (0, amount * size[1]),
-            "down": (0, -amount * size[1])
-        }
-        dx, dy = movement_values[self._tail.direction]  # movement steps for tail
-        self._move_tail(dx, dy)
-
-        # Add new body parts
-        x, y = self._tail.pos
-        new_sprites = []
-        for i in range(-amount + 1, 1):
-            logging.debug(f"Adding body at ({x - dx}, {y - dy}), new snake length = {self.snake_length}")
-            new_sprites.append(sprites.Body(pos=(x - dx, y - dy)))
-            x, y = new_sprites[-1].pos
-            dx, dy = movement_values[new_sprites[-1].direction]
-        new_sprites.reverse()  # reverse the list to add the segments in the correct order
-        self._add_sprites(new_sprites)
-        self.snake_segments.append(self._tail)
-
-        direction_fixes = {  # maps change in x or y position to a new direction fix
-            (0, -1): "up",
-            (0, 1): "down",
-            (-1, 0): "left",
-            (1, 0): "right"
-        }
-        # set prev_segment and fix directions for all snake parts except tail:
-        for i in range(0, len(self.snake_segments) - 1):
-            self.snake_segments[i].prev_segment = self.snake_segments[i + 1]
-            dx = self.snake_segments[i].pos[0] - self.snake_segments[i + 1].pos[0]
-            dy = self.snake_segments[i].pos[1] - self.snake_segments[i + 1].pos[1]
-            dx = 1 if dx else 0  # normalize the values
-            dy = 1 if dy else 0
-            direction = direction_fixes.get((dx, dy))
-            if direction is None:
-                raise ValueError(f"Got no new part direction {self.snake_segments[i]} for (dx, dy) = {dx, dy}.")
-            self.snake_segments[i].direction = direction
-        self.snake_segments[1].direction = self._head.direction
-
-    def _move_tail(self, dx: int = 0, dy: int = 0):
-        logging.debug(f"Moving tail by {dx, dy}. Old pos = {self._tail.pos}, New pos ="
-                      f" {self._tail.pos[0] + dx, self._tail.pos[1] + dy}.")
-        self._tail.pos = self._tail.pos[0] + dx, self._tail.pos[1] + dy
+        """Grows the snake by a given amount of body parts. A body part is added on each of the next ticks
+         while the snake grows, so nothing is made up front."""
+        self.engine.grow(amount)
+
+    def _mark_dirty(self, *sprite_list: pg.sprite.Sprite) -> None:
+        """Marks the current regions of the given sprites as changed, and the sprites to be redrawn.
+         Call it before and after moving a sprite to cover both its old and new region."""
+        for sprite in sprite_list:
+            self._dirty_rects.append(sprite.rect.copy())
+            self._dirty_sprites[sprite] = None
+
+    def _mark_body_dirty(self, pos: tuple[int, int]) -> None:
+        """Marks the region of the body part at a position as changed, and the part to be redrawn."""
+        rect = self._body.rect(pos)
+        self._dirty_rects.append(rect)
+        self._dirty_body.append(rect)
+
+    def _move_sprites(self) -> None:
+        """Moves the snake sprites after an engine step. Only the head, the tail and one body part change:
+         a body part is added at the neck, and if the tail moved, the last one is removed once the sliding tail
+         has reached its cell, so no gap opens between the body and the tail."""
+        cells = self.engine.body
+        body = self._body
+        self._mark_dirty(self._head, self._tail)
+        self._drop_trailing_body()
+        body.appendleft(sprites.cell_to_pos(cells[1]))
+        self._mark_body_dirty(body[0])
+        if sprites.cell_to_pos(cells[-1]) != self._tail.pos:  # the last body part is on the tail's new cell
+            if self.interpolate:
+                self._trailing_body = True
+            else:
+                self._dirty_rects.append(body.rect(body.pop()))
+        if len(body) > 1:  # the interpolated head was partly over the previous neck, which its old region covers
+            self._mark_body_dirty(body[1])
+        self._head.pos = sprites.cell_to_pos(cells[0])
+        self._head.direction = self.engine.direction
+        self._prev_tail_pos = self._tail.pos
+        self._tail.pos = sprites.cell_to_pos(cells[-1])
+        # the tail faces the segment ahead of it
+        if (direction := direction_between(cells[-1], cells[-2], self.engine.grid_size)) is not None:
+            self._tail.direction = direction
+        self._mark_dirty(self._head, self._tail)
+
+    def _drop_trailing_body(self) -> None:
+        """Removes the body part left on the tail's cell while the tail slid onto it."""
+        if self._trailing_body:
+            rect = self._body.rect(self._body.pop())
+            self._dirty_rects.append(rect)
+            # it may have been marked to be redrawn in this frame already
+            self._dirty_body[:] = [body_rect for body_rect in self._dirty_body if body_rect != rect]
+            self._trailing_body = False
 
     def pause(self) -> None:
         """Pauses the game."""
         self._pause = True
+        self._redraw_all = True
         if not self._game_over:
             logging.info("Pausing game.")
             self._show_pause_screen()
@@ -188,30 +310,45 @@ class SnakeGame:
         logging.info("unpausing game.")
         self._pause = False
         self._sprite_group.remove(self._pause_screen)
+        self._redraw_all = True
 
     def game_over(self) -> None:
         """Ends the game."""
-        logging.info(f"Game over! Score: {self._current_score}, High score: {self._high_score}")
+        logging.info(f"{'You won' if self.engine.won else 'Game over'}! Score: {self._current_score},"
+                     f" High score: {self._high_score}")
         self._game_over = True
+        self._game_over_time = time.perf_counter()
         self.pause()
-        self._background_music.stop()
-        play_sound("death.wav", self.sound_volume)
-        play_sound("Arcade Retro Game Over Sound Effect💤 sounds.wav", self.sound_volume - 0.2)
-        update_env("HIGH_SCORE", str(self._high_score))
-        self._show_game_over_screen()
-
-    def _show_game_over_screen(self) -> None:
-        """Creates the game over image."""
-        # noinspection PyTypeChecker
-        self._sprite_group.add(sprites.GameOverScreen(
+        self.audio.stop_music()
+        self.audio.play("death.wav")
+        self.audio.play("Arcade Retro Game Over Sound Effect💤 sounds.wav", self.audio.sound_volume - 0.2)
+        score = None
+        if self.replay is None:  # replays are not scored again
+            score = self.scores.add(self._current_score, self.engine.ticks, self.engine.seed)
+        self._save_recording()
+        self._show_game_over_screen(score)
+        if self.autopilot is not None:
+            logging.info(f"Autopilot stats: {self.autopilot.stats()}")
+
+    def _show_game_over_screen(self, score: Score | None = None) -> None:
+        """Creates the game over image, and the leaderboard below it with the given score marked."""
+        game_over_screen = sprites.GameOverScreen(
                 self._current_score,
                 self._high_score,
-                (self.screen_size[0] // 2, self.screen_size[1] // 2)
-        ))
+                (self.screen_size[0] // 2, self.screen_size[1] // 2),
+                title="You Won!" if self.engine.won else "Game Over!"
+        )
+        top_scores = self.scores.leaderboard(self.LEADERBOARD_SIZE)
+        current = next((i for i, top_score in enumerate(top_scores) if top_score is score), None)
+        leaderboard = sprites.Leaderboard([top_score.score for top_score in top_scores], (0, 0), current)
+        leaderboard.rect.midtop = game_over_screen.rect.midbottom
+        # noinspection PyTypeChecker
+        self._sprite_group.add(game_over_screen, leaderboard)
 
     def _show_pause_screen(self) -> None:
         """Creates the pause image."""
-        self._pause_screen = sprites.PauseScreen((self.screen_size[0] // 2, self.screen_size[1] // 2))
+        if self._pause_screen is None:  # the pause screen never changes, so it is only made once
+            self._pause_screen = sprites.PauseScreen((self.screen_size[0] // 2, self.screen_size[1] // 2))
         # noinspection PyTypeChecker
         self._sprite_group.add(self._pause_screen)
 
@@ -220,21 +357,58 @@ class SnakeGame:
         self._game_over = False
         self._pause = False
         self._current_score = 0
-        self._background_music.play(-1)
+        self.audio.play_music()
         # noinspection PyTypeChecker
         self._initialize_sprites()
+        if self.autopilot is not None:
+            self.autopilot.reset()
         logging.info("Game restarted.")
 
+    def snapshot(self) -> bytes:
+        """Returns the state of the current game in a compact binary form that restore takes back: the engine
+         with its random state, the score and the queued inputs. It is cheap enough to take every tick, and
+         small enough to keep several seconds of them for rolling back."""
+        queue = self.queue.snapshot()
+        return b"".join((_SNAPSHOT.pack(self._current_score, len(queue)), queue, self.engine.snapshot()))
+
+    def restore(self, data: bytes) -> None:
+        """Sets the game to a snapshot of this game, and redraws it. The recording of the game is stopped, since
+         the food can land elsewhere after a restore than the seed and the inputs would place it."""
+        score, queue_size = _SNAPSHOT.unpack_from(data)
+        offset = _SNAPSHOT.size
+        self.engine.restore(data[offset + queue_size:])
+        self.queue.restore(data[offset:offset + queue_size])
+        if self.recording is not None:
+            logging.info("Restored a snapshot, the recording of the game is stopped.")
+            self.recording = None
+        was_over = self._game_over
+        self._current_score = score
+        self._high_score = max(self._high_score, score)
+        self._game_over = self.engine.game_over
+        self._build_sprites()
+        if self.autopilot is not None:
+            self.autopilot.reset()
+        if self._game_over:
+            self._pause = True
+            self._game_over_time = time.perf_counter()
+            self._show_game_over_screen()
+        elif self._pause:
+            self._show_pause_screen()
+        if was_over and not self._game_over:
+            self.audio.play_music()
+
     def turn(self, direction: str) -> None:
         """Turns the snake's head in a given direction. Is used in self._handle_key_press()."""
-        if self._head.direction == direction:
-            return
-        self._head.direction = direction
+        self.engine.turn(direction)
 
     def _handle_events(self, events: list[pg.event.Event]) -> None:
         for event in events:
             match event.type:
                 case pg.QUIT:
+                    if not self._game_over:
+                        self._save_recording()
+                    self._save_profile()
+                    self.scores.close()  # wait for the last scores to be saved
                     quit_game()
                 case pg.KEYDOWN:
                     self._handle_key_press(event.key)
@@ -244,35 +418,168 @@ class SnakeGame:
         if key == pg.K_ESCAPE:  # _pause or resume the game
             self.unpause() if self._pause else self.pause()
         elif key in self.DIRECTION_KEYS:
-            frames = 1 if self._key_pressed else 0
-            self.queue.add(frames, [(self, f"turn('{self.DIRECTION_KEYS[key]}')")])
+            if self.autopilot is not None:
+                self.toggle_autopilot()  # the player takes over
+            # a second key press before the next tick is buffered for the tick after it
+            if self.replay is None:
+                self.queue.add(self.engine.ticks, Command.TURN, DIRECTION_NAMES.index(self.DIRECTION_KEYS[key]))
             if self._pause:
                 self.unpause()
-            self._key_pressed = True
         elif key in self.RESTART_KEYS and self._game_over:
             self.restart()
+        elif key == self.PROFILER_KEY:
+            self.toggle_profiler_overlay()
+        elif key == self.AUTOPILOT_KEY and self.replay is None:
+            self.toggle_autopilot()
+
+    def toggle_autopilot(self) -> None:
+        """Turns the autopilot on, or off if it is on."""
+        if self.autopilot is None:
+            self.autopilot = Autopilot(self.engine)
+            logging.info("Autopilot on.")
+            if self._pause and not self._game_over:
+                self.unpause()
+        else:
+            logging.info(f"Autopilot off. Stats: {self.autopilot.stats()}")
+            self.autopilot = None
+
+    def toggle_profiler_overlay(self) -> None:
+        """Shows the frame profiler overlay below the top bar, or hides it if it is shown."""
+        if self._profiler_overlay is None:
+            self._profiler_overlay = sprites.ProfilerOverlay(self.profiler, 1 / self.render_fps,
+                                                             pos=(0, sprites.TILE_SIZE[1]))
+        if self._profiler_overlay.alive():
+            self._sprite_group.remove(self._profiler_overlay)
+        else:
+            self._profiler_overlay.update_rect()
+            # noinspection PyTypeChecker
+            self._sprite_group.add(self._profiler_overlay)
+        self._redraw_all = True
+
+    def _save_profile(self) -> None:
+        """Writes the frame timings of the profiler to the profile file, if there is one."""
+        if self.profile_path is None:
+            return
+        self.profiler.save(self.profile_path)
+        logging.info(f"Saved frame timings of {len(self.profiler)} frames to '{self.profile_path}'.")
+
+    def _interpolate_sprites(self, alpha: float) -> None:
+        """Draws the head and tail the given fraction of the way from their positions before the last tick
+         to their current ones. Only their rects move, their tile positions stay the same."""
+        if self.world_view is not None:
+            self.world_view.alpha = alpha
+            return
+        if self._prev_tail_pos is None:
+            return
+        neck = self._body[0] if self._body else self._tail.pos
+        moves = ((self._head, neck, self._head.pos), (self._tail, self._prev_tail_pos, self._tail.pos))
+        self._mark_dirty(self._head, self._tail)
+        if self._body:
+            self._mark_body_dirty(neck)
+        for sprite, (x0, y0), (x1, y1) in moves:
+            # moves through the wrap-around jump to the other side of the board instead of sliding across it
+            if abs(x1 - x0) > sprites.TILE_SIZE[0] or abs(y1 - y0) > sprites.TILE_SIZE[1]:
+                sprite.rect.center = x1, y1
+            else:
+                sprite.rect.center = round(x0 + (x1 - x0) * alpha), round(y0 + (y1 - y0) * alpha)
+        self._mark_dirty(self._head, self._tail)
+        if self._trailing_body:
+            if self._tail.rect.center == self._tail.pos:
+                self._drop_trailing_body()
+            else:
+                self._mark_body_dirty(self._body[-1])  # the old region of the tail covered part of it
 
     def _update_screen(self, screen: pg.surface.Surface, background: pg.surface.Surface) -> None:
-        """Updates the screen surface."""
-        screen.blit(background, (0, sprites.TILE_SIZE[1]))
-        self._sprite_group.draw(screen)
-        pg.display.update()
-
-    def handle_collision(self) -> None:
-        """Checks any collisions between all the sprites and handle the collision logic.
+        """Updates the screen surface. Only the regions marked dirty are redrawn and sent to the display,
+         unless the whole screen needs a redraw."""
+        if self.world_view is not None and not (self._pause or self._game_over):
+            self._redraw_all = True  # the view scrolls with the head, so the whole board changes every frame
+        if self._redraw_all:
+            if self.world_view is None:
+                screen.blit(background, (0, sprites.TILE_SIZE[1]))
+                self._body.draw(screen)  # the body is below every sprite, so the head covers it on a collision
+            else:
+                self.world_view.draw(screen)
+            self._sprite_group.draw(screen)
+            if self._profiler_overlay is not None and self._profiler_overlay.alive():
+                screen.blit(self._profiler_overlay.image, self._profiler_overlay.rect)  # sprites added later are below it
+            pg.display.update()
+            self._redraw_all = False
+        elif self._dirty_rects:
+            # the opaque profiler overlay is drawn over any changed region below it
+            overlay = self._profiler_overlay
+            if overlay is not None and overlay.alive() and overlay.rect.collidelist(self._dirty_rects) >= 0:
+                self._dirty_sprites[overlay] = None
+            for rect in self._dirty_rects:  # the background starts below the top bar
+                screen.blit(background, rect, rect.move(0, -sprites.TILE_SIZE[1]))
+            body_image = self._body.image
+            screen.blits([(body_image, rect) for rect in self._dirty_body], doreturn=False)
+            for sprite in sorted(self._dirty_sprites, key=lambda s: self.DRAW_LAYERS.get(type(s), 0)):
+                if sprite.alive():  # skip sprites removed since they were marked
+                    screen.blit(sprite.image, sprite.rect)
+            pg.display.update(self._dirty_rects)
+        self._dirty_rects.clear()
+        self._dirty_sprites.clear()
+        self._dirty_body.clear()
+
+    def tick(self) -> None:
+        """Advances the game logic by one step and handles eating and collisions.
             Head + (Body or tail)-> Game Over
-            Head + Food -> Grow snake and replace with new food at random position."""
-        for i, segment in enumerate(self.snake_segments[1:]):  # check for collision with body or tail
-            if self._head.rect.colliderect(segment.rect):
-                if i == 1:  # should not be possible to turn in towards the second segment
-                    self._head.direction = segment.direction
-                else:
-                    self.game_over()
-                    # remove that body part to stop the head from dissapearing
-                    self._sprite_group.remove(self.snake_segments[i + 1])
-                    return
-        if self._head.rect.colliderect(self._food.rect):
+            Head + Food -> Grow snake and replace with new food at random position.
+            Snake covers the whole board -> Game Over, the player has won."""
+        if self._game_over:
+            return
+        if self.replay is not None and self.engine.ticks >= self.replay.ticks:
+            self.pause()  # the recording has ended without a game over
+            return
+        profiler = self.profiler
+        profiler.mark()
+        if self.autopilot is not None and self.replay is None:
+            # the autopilot's turns go through the queue and the recording like key presses, not its straight moves
+            direction = self.autopilot(self.engine)
+            if direction is not None and direction != self.engine.direction:
+                self.queue.add(self.engine.ticks, Command.TURN, DIRECTION_NAMES.index(direction))
+        self.handle_command()
+        profiler.lap(Phase.COMMAND)
+        reward, done = self.engine.step()
+        profiler.lap(Phase.STEP)
+        if self.world_view is None:
+            self._move_sprites()
+        else:
+            self.world_view.update()
+        profiler.lap(Phase.SPRITES)
+        if reward > 0:
             self.eat()
+            profiler.lap(Phase.EAT)
+        if done:
+            self.game_over()
+
+    def handle_command(self) -> None:
+        """Applies the queued command that is due on the current tick, if there is one.
+         When playing back a replay, applies the recorded direction input instead."""
+        if self.replay is not None:
+            if (direction := self._replay_inputs.get(self.engine.ticks)) is not None:
+                self.turn(DIRECTION_NAMES[direction])
+            return
+        if (item := self.queue.pop(self.engine.ticks)) is None:
+            return
+        command, arg = item
+        match command:
+            case Command.TURN:
+                if self.recording is not None:
+                    self.recording.add(self.engine.ticks, arg)
+                self.turn(DIRECTION_NAMES[arg])
+
+    def _save_recording(self) -> None:
+        """Saves the recording of the current game to the replay folder, if there is one."""
+        if self.replay_dir is None or self.replay is not None or self.recording is None:
+            return
+        self.recording.finish(self.engine)
+        os.makedirs(self.replay_dir, exist_ok=True)
+        file_name = f"replay_{time.strftime('%Y%m%d_%H%M%S')}_{self.engine.seed:016x}.snkr"
+        path = os.path.join(self.replay_dir, file_name)
+        self.recording.save(path)
+        logging.info(f"Saved replay to '{path}'.")
 
     def update_scores(self, amount: int = 1) -> None:
         """Updates the current score, and the high score if the current is higher."""
@@ -282,33 +589,68 @@ class SnakeGame:
             self._high_score = self._current_score
             self._top_bar.high_score = self._high_score
         self._top_bar.update_rect()
+        self._mark_dirty(self._top_bar)
 
     def eat(self) -> None:
-        """Grows the snake by one body part and replaces the food with a new one."""
-        self.grow()
+        """Updates the scores and replaces the food with a new one after the snake has eaten."""
         self.update_scores()
-        # noinspection PyTypeChecker
-        self._sprite_group.remove(self._food)
-        while self._food.pos in [sprite.pos for sprite in self._sprite_group]:  # make sure the food is not on the snake
-            self._food = sprites.Food(screen_size=self.screen_size,
-                                      max_dist=self._max_food_dist,
-                                      head_pos=self._head.pos)
-        self._add_sprites([self._food])
-        play_sound("eat.wav", self.sound_volume)
+        if self.world_view is not None:
+            pass  # the view draws the food from the engine
+        elif self.engine.food is None:  # no new food when the snake covers the whole board
+            self._mark_dirty(self._food)
+            # noinspection PyTypeChecker
+            self._sprite_group.remove(self._food)
+        else:
+            self._mark_dirty(self._food)
+            self._food.pos = sprites.cell_to_pos(self.engine.food)
+            self._mark_dirty(self._food)
+        self.audio.play("eat.wav")
 
     def run(self) -> None:
-        """Runs the game loop"""
-        screen = pg.display.set_mode((self.screen_size[0], self.screen_size[1]+sprites.TILE_SIZE[1]))
+        """Runs the game loop. The game logic runs at a fixed tick rate, while input is polled and the screen
+         is drawn at the render rate. Slow frames are caught up with extra ticks instead of slowing the game."""
+        screen = self._screen
         clock = pg.time.Clock()
-        background = pg.image.load(get_resource_path(r"..\assets\images\background.png"))
-        self._background_music.play(-1)
+        background = registry.image("background.png", alpha=False)
+        self.audio.play_music()
+        tick_time = 1 / self.tick_rate
+        max_ticks_per_frame = 5  # limits the catching up after a long stall, for example dragging the window
+        overlay_interval = max(self.render_fps // 4, 1)  # frames between updates of the profiler overlay
+        profiler = self.profiler
+        accumulator = 0.0
+        previous = time.perf_counter()
         while True:
-            clock.tick(self.fps)
-            self._key_pressed = False
+            clock.tick(self.render_fps)
+            profiler.begin_frame()
+            now = time.perf_counter()
+            elapsed = now - previous
+            previous = now
             self._handle_events(pg.event.get())
-            if not self._pause and not self._game_over:
-                self.queue.handle()
-                self.queue.update()
-                self._head.move()
-                self.handle_collision()
+            if self._game_over and self.autopilot is not None:
+                if now - self._game_over_time >= self.DEMO_RESTART_DELAY:
+                    self.restart()  # demo mode keeps playing
+            profiler.lap(Phase.EVENTS)
+            if not self._pause and not self._game_over:  # time spent paused does not count
+                accumulator += elapsed
+                ticks = 0
+                while accumulator >= tick_time and ticks < max_ticks_per_frame:
+                    self.tick()
+                    accumulator -= tick_time
+                    ticks += 1
+                    if self._pause or self._game_over:
+                        break
+                accumulator = min(accumulator, tick_time)
+                profiler.mark()
+                if self.interpolate and not self._game_over:
+                    self._interpolate_sprites(accumulator / tick_time)
+            overlay = self._profiler_overlay
+            if overlay is not None and overlay.alive() and profiler.frame % overlay_interval == 0:
+                overlay.update_rect()
+                self._mark_dirty(overlay)
             self._update_screen(screen, background)
+            profiler.lap(Phase.RENDER)
+            profiler.end_frame()
+            if profiler.frame == 1:
+                self.startup.lap("first frame")
+                if self._report_startup:
+                    print(self.startup.report(), file=sys.stderr)
@@ -1,18 +1,32 @@
+from array import array
+
 import pygame as pg
 
-from tools import get_resource_path, get_center_tile_pos, get_random_tile_pos
+from assets import registry
+from profiler import FrameProfiler, PHASE_NAMES
+from tools import get_center_tile_pos
 
 # Constants:
 TILE_SIZE = 32, 32
 SNAKE_COLOR = 224, 164, 54
 BACKGROUND_COLOR = 5, 142, 32
 FOOD_SIZE = TILE_SIZE
+FONT = "ThaleahFat.ttf"
+IMAGES = [  # (relative path, size, alpha) of the images preloaded before the game starts
+    ("head.png", TILE_SIZE, True),
+    ("tail.png", TILE_SIZE, True),
+    ("food.png", FOOD_SIZE, True),
+    ("background.png", None, False),
+]
+ORIENTED_IMAGES = [  # (relative path, size) of the images facing right that are rotated to every direction
+    ("head.png", TILE_SIZE),
+    ("tail.png", TILE_SIZE),
+]
 
 
-def load_image(path: str, size: tuple[int, int]) -> pg.surface.Surface:
-    """Load an image from the given path and scale it to the given size."""
-    image = pg.image.load(path)
-    return pg.transform.scale(image, size)
+def cell_to_pos(cell: tuple[int, int]) -> tuple[int, int]:
+    """Returns the center pixel position of a board cell. The board starts one tile below the top bar."""
+    return cell[0] * TILE_SIZE[0] + TILE_SIZE[0] // 2, (cell[1] + 1) * TILE_SIZE[1] + TILE_SIZE[1] // 2
 
 
 class SpriteGroup(pg.sprite.Group):
@@ -21,13 +35,6 @@ class SpriteGroup(pg.sprite.Group):
     def __init__(self):
         super().__init__()
 
-    def move(self):
-        """NOT CURRENTLY USED. Move all sprites in the group by one tile size in the direction the sprite is facing."""
-        for sprite in self.sprites():
-            if not isinstance(sprite, SnakeSegment):  # dont move the food
-                continue
-            sprite.move()
-
 
 class BaseTextOverlay(pg.sprite.Sprite):
     """Base class for text overlays for inheritance."""
@@ -47,17 +54,17 @@ class BaseTextOverlay(pg.sprite.Sprite):
         self._anchor = anchor
 
         # Create text surface
-        fonts = [
-            pg.font.Font(get_resource_path("../assets/fonts/ThaleahFat.ttf"), size)
-            for size in font_sizes
-        ]
-        rendered_lines = [font.render(line, True, font_color) for font, line in zip(fonts, text_lines)]
-        line_pad = fonts[0].get_height() // 5  # padding between lines as function of their sizes
+        rendered_lines = [registry.text(FONT, size, line, font_color) for size, line in zip(font_sizes, text_lines)]
+        # padding between lines as function of their sizes
+        line_pad = registry.font(FONT, font_sizes[0]).get_height() // 5
         if bg_size:
             width, height = bg_size
         else:
             width = max(rendered_line.get_width() for rendered_line in rendered_lines)
             height = sum(rendered_line.get_height() for rendered_line in rendered_lines) + 2 * line_pad
+            # overlays with more than three lines need room for the padding between all of them
+            height = max(height, (len(rendered_lines) - 1) * (rendered_lines[-1].get_height() + line_pad)
+                         + rendered_lines[-1].get_height())
         self.image = pg.Surface((width, height), pg.SRCALPHA)
         if bg_color:
             self.image.fill(bg_color)
@@ -85,30 +92,35 @@ class BaseTextOverlay(pg.sprite.Sprite):
 
 
 class TopBar(BaseTextOverlay):
-    """Bar at the top of the screen with score and high score text."""
+    """Bar at the top of the screen with score and high score text. The text is put together from
+     cached pieces, so a score change only renders digits that have not been shown before."""
+    FONT_SIZE = 30
+    FONT_COLOR = "black"
 
     def __init__(self,
                  current_score: int,
                  high_score: int,
                  size: tuple[int, int]) -> None:
+        pg.sprite.Sprite.__init__(self)
         self.current_score = current_score
         self.high_score = high_score if high_score else "N/A"  # if no high score, display N/A
-        super().__init__(
-                text_lines=[f"Score: {self.current_score}  High Score: {self.high_score}"],
-                font_sizes=[30],
-                pos=(0, 0),
-                anchor="topleft",
-                font_color="black",
-                bg_color=BACKGROUND_COLOR,
-                bg_size=size
-        )
+        self.pos = 0, 0
+        self._anchor = "topleft"
+        self.image = pg.Surface(size, pg.SRCALPHA)
+        self.rect = self.get_rect(self.pos, self._anchor)
+        self.update_rect()
 
     def update_rect(self):
-        self.__init__(
-                current_score=self.current_score,
-                high_score=self.high_score,
-                size=self.rect.size
-        )
+        """Redraws the bar with the current scores."""
+        pieces = ["Score: ", *str(self.current_score), "  High Score: "]
+        # N/A is a single piece, a number is split into cached digits
+        pieces += [self.high_score] if isinstance(self.high_score, str) else [*str(self.high_score)]
+        rendered = [registry.text(FONT, self.FONT_SIZE, piece, self.FONT_COLOR) for piece in pieces]
+        self.image.fill(BACKGROUND_COLOR)
+        x = (self.image.get_width() - sum(surface.get_width() for surface in rendered)) // 2
+        for surface in rendered:
+            self.image.blit(surface, (x, 0))
+            x += surface.get_width()
 
 
 class GameOverScreen(BaseTextOverlay):
@@ -118,11 +130,12 @@ class GameOverScreen(BaseTextOverlay):
                  current_score: int,
                  high_score: int,
                  size: tuple[int, int],
-                 font_size: int = 70) -> None:
+                 font_size: int = 70,
+                 title: str = "Game Over!") -> None:
         self.current_score = current_score
         self.high_score = high_score if high_score else "N/A"  # if no high score, display N/A
         super().__init__(
-                text_lines=["Game Over!", f"Score: {self.current_score}, High Score: {self.high_score}",
+                text_lines=[title, f"Score: {self.current_score}, High Score: {self.high_score}",
                             "Press ENTER/SPACE to restart"],
                 font_sizes=[font_size, font_size // 2, font_size // 2],
                 pos=size,
@@ -131,6 +144,27 @@ class GameOverScreen(BaseTextOverlay):
         )
 
 
+class Leaderboard(BaseTextOverlay):
+    """List of the top scores shown below the game over screen. The score of the last game is marked."""
+
+    def __init__(self,
+                 scores: list[int],
+                 pos: tuple[int, int],
+                 current: int | None = None,
+                 anchor: str = "center",
+                 font_size: int = 24) -> None:
+        self.scores = scores
+        self.current = current  # index of the score of the last game in the list, if it made it in
+        lines = [f"{rank}. {score}{'  <' if rank - 1 == current else ''}" for rank, score in enumerate(scores, 1)]
+        super().__init__(
+                text_lines=["Top Scores", *lines],
+                font_sizes=[font_size] * (len(lines) + 1),
+                pos=pos,
+                anchor=anchor,
+                font_color="red"
+        )
+
+
 class PauseScreen(BaseTextOverlay):
     """Pause screen class."""
 
@@ -148,6 +182,67 @@ class PauseScreen(BaseTextOverlay):
         )
 
 
+class ProfilerOverlay(BaseTextOverlay):
+    """Overlay with a graph of the last frame times, split into the profiled phases, and the p50 and p99
+     of each phase. It is opaque, so it can be redrawn on its own over anything below it."""
+    GRAPH_SIZE = 240, 80  # one pixel column per frame
+    COLUMNS = 4, 100, 172  # x positions of the phase name and percentile columns
+    FONT_SIZE = 16
+    FONT_COLOR = "white"
+    BG_COLOR = 20, 20, 20
+    BUDGET_COLOR = "red"
+    PHASE_COLORS = [(90, 160, 255), (255, 230, 90), (255, 140, 40), (170, 110, 255), (90, 230, 120),
+                    (220, 220, 220)]  # in the order of profiler.Phase
+
+    def __init__(self,
+                 profiler: FrameProfiler,
+                 budget: float,
+                 pos: tuple[int, int],
+                 anchor: str = "topleft") -> None:
+        pg.sprite.Sprite.__init__(self)
+        self.profiler = profiler
+        self.budget = budget  # frame time in seconds drawn as a line, the graph shows twice this
+        self.pos = pos
+        self._anchor = anchor
+        line_height = registry.font(FONT, self.FONT_SIZE).get_linesize()
+        width = self.GRAPH_SIZE[0] + 8
+        height = self.GRAPH_SIZE[1] + 8 + (len(PHASE_NAMES) + 2) * line_height
+        self.image = pg.Surface((width, height))
+        self.rect = self.get_rect(self.pos, self._anchor)
+        self.update_rect()
+
+    def update_rect(self):
+        """Redraws the graph and the percentiles with the frames currently in the profiler."""
+        self.image.fill(self.BG_COLOR)
+        graph_width, graph_height = self.GRAPH_SIZE
+        scale = graph_height / (2 * self.budget)  # pixels per second
+        bottom = 4 + graph_height
+        rows = self.profiler.rows()[-graph_width:]
+        for x, (_, total, durations) in enumerate(rows, start=4 + graph_width - len(rows)):
+            y = bottom
+            for color, duration in zip(self.PHASE_COLORS, durations):
+                if (height := round(duration * scale)) > 0:
+                    pg.draw.line(self.image, color, (x, y - 1), (x, max(y - height, 4)))
+                    y -= height
+            # the untimed rest of the frame, for example the sprite interpolation
+            if (height := round(total * scale) - (bottom - y)) > 0:
+                pg.draw.line(self.image, "gray40", (x, y - 1), (x, max(y - height, 4)))
+        budget_y = bottom - round(self.budget * scale)
+        pg.draw.line(self.image, self.BUDGET_COLOR, (4, budget_y), (4 + graph_width - 1, budget_y))
+
+        # the numbers change every update, so they are rendered directly instead of through the text cache
+        font = registry.font(FONT, self.FONT_SIZE)
+        percentiles = self.profiler.percentiles(50, 99)
+        lines = [(("phase", "p50 ms", "p99 ms"), self.FONT_COLOR)]
+        lines += [((name, f"{p50 * 1000:.2f}", f"{p99 * 1000:.2f}"), color)
+                  for (name, (p50, p99)), color in zip(percentiles.items(), [self.FONT_COLOR, *self.PHASE_COLORS])]
+        y = bottom + 4
+        for columns, color in lines:
+            for x, text in zip(self.COLUMNS, columns):
+                self.image.blit(font.render(text, True, color), (x, y))
+            y += font.get_linesize()
+
+
 def get_rect(self,
              pos: tuple[int, int],
              anchor: str = "center") -> pg.rect.Rect:
@@ -173,7 +268,8 @@ class BaseSprite(pg.sprite.Sprite):
                  anchor: str = "center") -> None:
         super().__init__()
         self._anchor = anchor
-        self.image = pg.transform.scale(self.image, size)
+        if self.image.get_size() != size:
+            self.image = pg.transform.scale(self.image, size)
         self.pos = get_center_tile_pos(pos, TILE_SIZE)
         # self.rect gets set in the pos setter
 
@@ -193,76 +289,37 @@ class BaseSprite(pg.sprite.Sprite):
                  pos: tuple[int, int],
                  anchor: str = "center") -> pg.rect.Rect:
         """Returns a sprite rect at a given position."""
-        anchor_positions = {
-            "topleft": self.image.get_rect(topleft=pos),
-            "topright": self.image.get_rect(topright=pos),
-            "bottomleft": self.image.get_rect(bottomleft=pos),
-            "bottomright": self.image.get_rect(bottomright=pos),
-            "center": self.image.get_rect(center=pos),
-        }
-        return anchor_positions.get(anchor, self.image.get_rect(center=pos))  # defaults to anchor center
-
-    def move(self) -> None:
-        """Placeholder move method for inheritance."""
-        pass
+        if anchor not in ("topleft", "topright", "bottomleft", "bottomright", "center"):
+            anchor = "center"  # defaults to anchor center
+        return self.image.get_rect(**{anchor: pos})
 
 
 class SnakeSegment(BaseSprite):
-    """Base snake body part sprite class for inheritance."""
+    """Base snake body part sprite class for inheritance. The segment is only drawn,
+     the movement of the snake is handled by the game engine."""
+    # maps directions to the shared images facing that direction, None for segments that don't turn
+    orientations: dict[str, pg.surface.Surface] | None = None
+    ALLOWED_TURNS = {  # maps the current direction to the directions it can turn to, a u-turn is not allowed
+        "up": ("left", "right"),
+        "down": ("left", "right"),
+        "left": ("up", "down"),
+        "right": ("up", "down"),
+    }
 
     def __init__(self,
                  pos: tuple[int, int],
                  anchor: str = "center",
-                 direction: str = "right",
-                 prev_segment: BaseSprite = None) -> None:
+                 direction: str = "right") -> None:
         match direction.lower():
             case "up" | "down" | "left" | "right":
                 self._direction = direction
             case _:
                 raise ValueError(f"Invalid direction: '{direction}'.")
+        if self.orientations is not None:
+            self.image = self.orientations[direction]
         super().__init__(size=TILE_SIZE,
                          pos=pos,
                          anchor=anchor)
-        self.prev_segment = prev_segment
-
-    def move(self) -> None:
-        """Move the snake sprite in the direction it is facing by one tile size."""
-        x, y = self.pos
-        match self._direction.lower():
-            case "up":
-                self.pos = (x, y - TILE_SIZE[1])
-            case "down":
-                self.pos = (x, y + TILE_SIZE[1])
-            case "left":
-                self.pos = (x - TILE_SIZE[0], y)
-            case "right":
-                self.pos = (x + TILE_SIZE[0], y)
-            case _:
-                raise ValueError(f"Invalid direction: '{self._direction}'.")
-        # check if outside the image
-        self._handle_outside_bounds()
-        # move next snake segment
-        if self.prev_segment is not None:
-            self.prev_segment.move()
-            self.prev_segment.pos = x, y
-            self.prev_segment.direction = self.direction  # turn the previous segment to face this segment
-
-    def _handle_outside_bounds(self) -> None:
-        """Check if the snake sprite is outside the image and move it to the opposite side if it is."""
-        x, y = self.pos
-        new_x, new_y = x, y
-        screen_w, screen_h = pg.display.get_surface().get_size()
-        tile_w, tile_h = TILE_SIZE
-        min_x, min_y = 0, tile_h
-        if x - tile_w / 2 < min_x:
-            new_x = screen_w - tile_w / 2
-        elif x > screen_w:
-            new_x = min_x + tile_w / 2
-        if y - tile_h / 2 < min_y:
-            new_y = screen_h - tile_h / 2
-        elif y > screen_h:
-            new_y = min_y + tile_h / 2
-        self.pos = new_x, new_y
 
     @property
     def direction(self) -> str:
@@ -272,21 +329,11 @@ class SnakeSegment(BaseSprite):
     @direction.setter
     def direction(self, direction: str) -> None:
         """Turn the snake sprite to face the given direction. Prevents the snake from doing a u-turn."""
-        allowed_turns = {  # initial key is current self.direction, nested key is desired given direction.
-            "up": {"left": 90, "right": -90},
-            "down": {"left": -90, "right": 90},
-            "left": {"up": -90, "down": 90},
-            "right": {"up": 90, "down": -90},
-        }
-        rotation_angle = allowed_turns.get(self._direction).get(direction)
-        if rotation_angle is not None:
-            self.rotate(rotation_angle)
+        if direction in self.ALLOWED_TURNS[self._direction]:
             self._direction = direction
-
-    def rotate(self, degrees: int) -> None:
-        """Rotates the sprite a given degree. Positive degrees is counter-clockwise, negative is clockwise."""
-        self.image = pg.transform.rotate(self.image, degrees)
-        self.rect = self.get_rect(self.pos, self._anchor)
+            if self.orientations is not None:
+                # all orientations have the same size, so the rect stays the same
+                self.image = self.orientations[direction]
 
 
 class Head(SnakeSegment):
@@ -295,13 +342,11 @@ class Head(SnakeSegment):
     def __init__(self,
                  pos: tuple[int, int],
                  anchor: str = "center",
-                 direction: str = "right",
-                 prev_segment: SnakeSegment = None) -> None:
-        self.image = load_image(get_resource_path(r"..\assets\images\head.png"), TILE_SIZE)
+                 direction: str = "right") -> None:
+        self.orientations = registry.orientations("head.png", TILE_SIZE)
         super().__init__(pos=pos,
                          anchor=anchor,
-                         direction=direction,
-                         prev_segment=prev_segment)
+                         direction=direction)
 
 
 class Tail(SnakeSegment):
@@ -311,46 +356,88 @@ class Tail(SnakeSegment):
                  pos: tuple[int, int],
                  anchor: str = "center",
                  direction: str = "right") -> None:
-        self.image = load_image(get_resource_path(r"..\assets\images\tail.png"), TILE_SIZE)
+        self.orientations = registry.orientations("tail.png", TILE_SIZE)
         super().__init__(pos=pos,
                          anchor=anchor,
-                         direction=direction,
-                         prev_segment=None)
+                         direction=direction)
 
 
-class Body(SnakeSegment):
-    """Snake body sprite class."""
+class BodySegments:
+    """Body parts of the snake between the head and the tail, from the neck to the tail. The parts all look the
+     same, so instead of a sprite per part only their center positions are stored, in ring buffers that double
+     in size when full, and one shared surface is drawn for all of them with a single batched blit.
+     A part takes 8 bytes."""
+    __slots__ = ("image", "_xs", "_ys", "_start", "_size")
 
-    def __init__(self,
-                 pos: tuple[int, int],
-                 anchor: str = "center",
-                 direction: str = "right",
-                 prev_segment: SnakeSegment = None) -> None:
+    def __init__(self, capacity: int = 64) -> None:
         self.image = pg.Surface(TILE_SIZE)
         self.image.fill(SNAKE_COLOR)
-        super().__init__(pos=pos,
-                         anchor=anchor,
-                         direction=direction,
-                         prev_segment=prev_segment)
-
-    def rotate(self, degrees: any) -> None:
-        """No rotation needed for the body as it is a colored square sprite."""
-        pass
+        if pg.display.get_surface() is not None:  # converting needs a display mode
+            self.image = self.image.convert()
+        self._xs = array("i", [0]) * capacity
+        self._ys = array("i", [0]) * capacity
+        self._start = 0  # index of the neck
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, index: int) -> tuple[int, int]:
+        """Returns the center position of a part, 0 is the neck and -1 the part before the tail."""
+        if not -self._size <= index < self._size:
+            raise IndexError("Body part index out of range.")
+        i = (self._start + index % self._size) % len(self._xs)
+        return self._xs[i], self._ys[i]
+
+    def __iter__(self):
+        capacity = len(self._xs)
+        for index in range(self._start, self._start + self._size):
+            yield self._xs[index % capacity], self._ys[index % capacity]
+
+    def appendleft(self, pos: tuple[int, int]) -> None:
+        """Adds a part at the neck."""
+        if self._size == len(self._xs):
+            self._resize(2 * len(self._xs))
+        self._start = (self._start - 1) % len(self._xs)
+        self._xs[self._start], self._ys[self._start] = pos
+        self._size += 1
+
+    def pop(self) -> tuple[int, int]:
+        """Removes the part before the tail and returns its position."""
+        if not self._size:
+            raise IndexError("Pop from empty body.")
+        pos = self[-1]
+        self._size -= 1
+        return pos
+
+    def clear(self) -> None:
+        self._start = 0
+        self._size = 0
+
+    def _resize(self, capacity: int) -> None:
+        """Moves the parts to new buffers with the given capacity, starting at index 0."""
+        positions = list(self)
+        self._xs = array("i", [0]) * capacity
+        self._ys = array("i", [0]) * capacity
+        for i, (x, y) in enumerate(positions):
+            self._xs[i], self._ys[i] = x, y
+        self._start = 0
+
+    def rect(self, pos: tuple[int, int]) -> pg.rect.Rect:
+        """Returns the rect of a part at a center position."""
+        return self.image.get_rect(center=pos)
+
+    def draw(self, surface: pg.surface.Surface) -> None:
+        """Draws all parts in one batched blit."""
+        image = self.image
+        half_w, half_h = TILE_SIZE[0] // 2, TILE_SIZE[1] // 2
+        surface.blits([(image, (x - half_w, y - half_h)) for x, y in self], doreturn=False)
 
 
 class Food(BaseSprite):
     """Food sprite class."""
 
-    def __init__(self,
-                 screen_size: tuple[int, int],
-                 max_dist: int,
-                 head_pos: tuple[int, int]) -> None:
-        pos = get_random_tile_pos(
-                screen_size=((0, screen_size[0] - TILE_SIZE[0]), (TILE_SIZE[1], screen_size[1] - TILE_SIZE[1])),
-                tile_size=TILE_SIZE,
-                max_dist=max_dist,
-                reference_pos=head_pos
-        )
-        self.image = load_image(get_resource_path(r"..\assets\images\food.png"), TILE_SIZE)
+    def __init__(self, pos: tuple[int, int]) -> None:
+        self.image = registry.image("food.png", TILE_SIZE)
         super().__init__(size=FOOD_SIZE,
                          pos=pos)
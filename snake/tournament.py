@@ -0,0 +1,169 @@
+import argparse
+import csv
+import importlib
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import NamedTuple
+
+from bots import ControllerFactory
+from engine import SnakeEngine
+
+
+class GameResult(NamedTuple):
+    """Result of one headless game."""
+    seed: int
+    score: int
+    ticks: int
+    length: int
+    won: bool
+    seconds: float  # time the game took to play
+
+
+def load_controller(spec: str) -> ControllerFactory:
+    """Returns the controller factory named by a 'module:name' spec, for example 'bots:GreedyBot'."""
+    module_name, _, name = spec.partition(":")
+    if not name:
+        raise ValueError(f"Invalid controller: '{spec}'. Controllers are given as 'module:name'.")
+    return getattr(importlib.import_module(module_name), name)
+
+
+def play_game(factory: ControllerFactory,
+              grid_size: tuple[int, int],
+              seed: int,
+              max_ticks: int,
+              max_food_dist: int = 5) -> GameResult:
+    """Plays one game with the controller until it is over or has lasted max_ticks ticks."""
+    start = time.perf_counter()
+    engine = SnakeEngine(grid_size, max_food_dist, seed=seed)
+    controller = factory(engine)
+    step = engine.step
+    while not engine.game_over and engine.ticks < max_ticks:
+        step(controller(engine))
+    return GameResult(seed, engine.score, engine.ticks, engine.length, engine.won, time.perf_counter() - start)
+
+
+def play_games(controller: str,
+               grid_size: tuple[int, int],
+               seeds: range,
+               max_ticks: int,
+               max_food_dist: int) -> list[GameResult]:
+    """Plays a game for each seed. Runs in the worker processes, so the controller is passed by its spec."""
+    factory = load_controller(controller)
+    return [play_game(factory, grid_size, seed, max_ticks, max_food_dist) for seed in seeds]
+
+
+def percentile(sorted_values: list[float], percent: float) -> float:
+    """Returns the given percentile of sorted values."""
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * percent / 100))]
+
+
+def summarize(results: list[GameResult], elapsed: float, workers: int) -> dict:
+    """Returns the score and survival statistics of the games and the throughput of the tournament."""
+    scores = sorted(result.score for result in results)
+    ticks = sorted(result.ticks for result in results)
+    steps = sum(ticks)
+    histogram = {}
+    for score in scores:
+        histogram[score] = histogram.get(score, 0) + 1
+    return {
+        "games": len(results),
+        "wins": sum(result.won for result in results),
+        "score": {
+            "mean": statistics.fmean(scores),
+            "stdev": statistics.pstdev(scores),
+            "min": scores[0],
+            "p10": percentile(scores, 10),
+            "median": percentile(scores, 50),
+            "p90": percentile(scores, 90),
+            "max": scores[-1],
+            "histogram": histogram,
+        },
+        "ticks": {
+            "mean": statistics.fmean(ticks),
+            "median": percentile(ticks, 50),
+            "max": ticks[-1],
+        },
+        "steps": steps,
+        "seconds": elapsed,
+        "workers": workers,
+        "steps_per_second": steps / elapsed if elapsed else 0.0,
+        "steps_per_second_per_worker": steps / sum(result.seconds for result in results) if steps else 0.0,
+    }
+
+
+def run(controller: str,
+        grid_size: tuple[int, int],
+        seeds: range,
+        max_ticks: int,
+        max_food_dist: int = 5,
+        workers: int | None = None,
+        chunk_size: int | None = None,
+        results_path: str | None = None) -> dict:
+    """Plays a game for every seed, spread over a pool of worker processes, and returns the summary.
+     The seeds are sent to the workers in chunks, and the results of each chunk are written to the
+     results CSV file as soon as it is done."""
+    if not seeds:
+        raise ValueError("The range of seeds is empty.")
+    load_controller(controller)  # fails early on an invalid controller
+    workers = workers or os.cpu_count() or 1
+    # a few chunks per worker keep every core busy until the end without much overhead per game
+    chunk_size = chunk_size or max(1, min(1000, len(seeds) // (workers * 8)))
+    chunks = [seeds[i:i + chunk_size] for i in range(0, len(seeds), chunk_size)]
+    results: list[GameResult] = []
+    start = time.perf_counter()
+    results_file = open(results_path, "w", newline="") if results_path is not None else None
+    try:
+        writer = csv.writer(results_file) if results_file is not None else None
+        if writer is not None:
+            writer.writerow(GameResult._fields)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(play_games, controller, grid_size, chunk, max_ticks, max_food_dist)
+                       for chunk in chunks]
+            for future in as_completed(futures):
+                chunk_results = future.result()
+                results += chunk_results
+                if writer is not None:
+                    writer.writerows(chunk_results)
+                print(f"\r{len(results)}/{len(seeds)} games", end="", file=sys.stderr, flush=True)
+        print(file=sys.stderr)
+    finally:
+        if results_file is not None:
+            results_file.close()
+    summary = summarize(results, time.perf_counter() - start, workers)
+    summary.update({"controller": controller, "grid_size": list(grid_size), "seeds": [seeds.start, seeds.stop],
+                    "max_ticks": max_ticks})
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Plays many headless games with a controller over a range of seeds.")
+    parser.add_argument("--controller", default="bots:GreedyBot",
+                        help="controller factory as 'module:name', called with the engine of each game")
+    parser.add_argument("--seeds", type=int, nargs=2, default=(0, 10000), metavar=("FIRST", "STOP"),
+                        help="range of seeds to play, one game per seed")
+    parser.add_argument("--grid-size", type=int, nargs=2, default=(20, 15), metavar=("COLUMNS", "ROWS"))
+    parser.add_argument("--max-ticks", type=int, default=100000, help="ticks after which a game is stopped")
+    parser.add_argument("--max-food-dist", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, default is one per core")
+    parser.add_argument("--chunk-size", type=int, default=None, help="games sent to a worker at a time")
+    parser.add_argument("--results", default=None, help="CSV file to write the result of every game to")
+    parser.add_argument("--output", default=None, help="JSON file to write the summary to, default is stdout")
+    args = parser.parse_args()
+    if args.seeds[1] <= args.seeds[0]:
+        parser.error("The range of seeds is empty, STOP must be larger than FIRST.")
+
+    summary = run(args.controller, tuple(args.grid_size), range(*args.seeds), args.max_ticks, args.max_food_dist,
+                  args.workers, args.chunk_size, args.results)
+    if args.output is None:
+        print(json.dumps(summary, indent=2))
+    else:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+import math
+from typing import TYPE_CHECKING
+
+import pygame as pg
+
+import sprites
+from assets import registry
+from engine import SnakeEngine, direction_between
+
+if TYPE_CHECKING:  # the networking modules are only imported by the multiplayer client
+    from netcode import ArenaMirror
+
+
+def tile_background(size: tuple[int, int]) -> pg.surface.Surface:
+    """Returns the checkered background repeated to cover a view of the given size at any scroll offset."""
+    tile_w, tile_h = sprites.TILE_SIZE
+    pattern = registry.image("background.png", alpha=False).subsurface((0, 0, 2 * tile_w, 2 * tile_h))
+    background = pg.Surface((size[0] + 2 * tile_w, size[1] + 2 * tile_h))
+    for x in range(0, background.get_width(), 2 * tile_w):
+        for y in range(0, background.get_height(), 2 * tile_h):
+            background.blit(pattern, (x, y))
+    return background.convert() if pg.display.get_surface() is not None else background
+
+
+def blit_wrapped(screen: pg.surface.Surface,
+                 rect: pg.rect.Rect,
+                 grid_size: tuple[int, int],
+                 image: pg.surface.Surface,
+                 x: float,
+                 y: float,
+                 left: int,
+                 top: int) -> None:
+    """Draws a tile image with its top left corner at a board pixel position, if it is inside the view drawn
+     in rect. The top left corner of the view is at the (left, top) board pixel position."""
+    world_w = grid_size[0] * sprites.TILE_SIZE[0]
+    world_h = grid_size[1] * sprites.TILE_SIZE[1]
+    # the nearest copy of the position through the wrap-around, tiles partly left of or above the view count
+    screen_x = (round(x) - left + sprites.TILE_SIZE[0]) % world_w - sprites.TILE_SIZE[0]
+    screen_y = (round(y) - top + sprites.TILE_SIZE[1]) % world_h - sprites.TILE_SIZE[1]
+    if screen_x < rect.width and screen_y < rect.height:
+        screen.blit(image, (rect.x + screen_x, rect.y + screen_y))
+
+
+class WorldView:
+    """Draws the part of a board larger than the window around the snake's head, with a camera that follows
+     the head across the wrap-around. Only the cells inside the view are looked at and no sprite is made
+     per body part, so drawing costs the same for any board size and snake length."""
+
+    def __init__(self, engine: SnakeEngine, rect: pg.rect.Rect) -> None:
+        cols, rows = engine.grid_size
+        if cols * sprites.TILE_SIZE[0] < rect.width or rows * sprites.TILE_SIZE[1] < rect.height:
+            raise ValueError("The board must be at least as large as the view.")
+        self.engine = engine
+        self.rect = rect  # screen region the board is drawn in
+        self.alpha = 1.0  # fraction of the way from the last tick to the next one that is drawn
+        # cells at the edges are partly inside the view while it scrolls, so there is one more of them
+        self.columns = math.ceil(rect.width / sprites.TILE_SIZE[0]) + 1
+        self.rows = math.ceil(rect.height / sprites.TILE_SIZE[1]) + 1
+        self._background = tile_background(rect.size)
+        self._body_image = pg.Surface(sprites.TILE_SIZE)
+        self._body_image.fill(sprites.SNAKE_COLOR)
+        self._head_images = registry.orientations("head.png", sprites.TILE_SIZE)
+        self._tail_images = registry.orientations("tail.png", sprites.TILE_SIZE)
+        self._food_image = registry.image("food.png", sprites.FOOD_SIZE)
+        self._tail = engine.tail
+        self._prev_tail: tuple[int, int] | None = None  # tail cell before the last tick, None before the first
+        self._tail_direction = "right"
+
+    def reset(self) -> None:
+        """Starts following the snake of a new or restored game."""
+        engine = self.engine
+        self._tail = engine.tail
+        self._prev_tail = None
+        self._tail_direction = direction_between(engine.body[-1], engine.body[-2], engine.grid_size) or "right"
+        self.alpha = 1.0
+
+    def update(self) -> None:
+        """Follows the snake after an engine step."""
+        engine = self.engine
+        self._prev_tail = self._tail
+        self._tail = engine.tail
+        # the tail faces the segment ahead of it
+        if (direction := direction_between(engine.body[-1], engine.body[-2], engine.grid_size)) is not None:
+            self._tail_direction = direction
+
+    def _between(self, cell_from: tuple[int, int], cell_to: tuple[int, int]) -> tuple[float, float]:
+        """Returns the board pixel position of the top left corner of a tile moved the alpha fraction of the way
+         from one cell to the next. Moves through the wrap-around continue past the edge of the board."""
+        cols, rows = self.engine.grid_size
+        dx = (cell_to[0] - cell_from[0] + cols // 2) % cols - cols // 2
+        dy = (cell_to[1] - cell_from[1] + rows // 2) % rows - rows // 2
+        return ((cell_from[0] + dx * self.alpha) * sprites.TILE_SIZE[0],
+                (cell_from[1] + dy * self.alpha) * sprites.TILE_SIZE[1])
+
+    def draw(self, screen: pg.surface.Surface) -> None:
+        """Draws the board around the head. The view is centered on the head, between its last two cells."""
+        engine = self.engine
+        cols, rows = engine.grid_size
+        tile_w, tile_h = sprites.TILE_SIZE
+        moved = self._prev_tail is not None
+        head_x, head_y = self._between(engine.body[1] if moved else engine.head, engine.head)
+        # board pixel position of the top left corner of the view
+        left = round(head_x + tile_w / 2 - self.rect.width / 2)
+        top = round(head_y + tile_h / 2 - self.rect.height / 2)
+        first_col, offset_x = divmod(left, tile_w)
+        first_row, offset_y = divmod(top, tile_h)
+
+        clip = screen.get_clip()
+        screen.set_clip(self.rect)
+        # the background repeats every two tiles, so the tiled copy is drawn from the matching offset
+        screen.blit(self._background, self.rect,
+                    pg.Rect(left % (2 * tile_w), top % (2 * tile_h), self.rect.width, self.rect.height))
+
+        # the head and tail cells are drawn with their images, the tail's cell is drawn as body below the tail
+        # until the sliding tail has reached it, so no gap opens behind the body
+        skip = {engine.head}
+        if not moved or self.alpha >= 1 or self._prev_tail == engine.tail:
+            skip.add(engine.tail)
+        is_occupied = engine.is_occupied
+        body_image = self._body_image
+        blits = []
+        for row in range(self.rows):
+            y = (first_row + row) % rows
+            screen_y = self.rect.y + row * tile_h - offset_y
+            for column in range(self.columns):
+                cell = (first_col + column) % cols, y
+                if is_occupied(cell) and cell not in skip:
+                    blits.append((body_image, (self.rect.x + column * tile_w - offset_x, screen_y)))
+        screen.blits(blits, doreturn=False)
+
+        if engine.food is not None:
+            blit_wrapped(screen, self.rect, engine.grid_size, self._food_image,
+                         engine.food[0] * tile_w, engine.food[1] * tile_h, left, top)
+        tail_x, tail_y = self._between(self._prev_tail if moved else engine.tail, engine.tail)
+        blit_wrapped(screen, self.rect, engine.grid_size, self._tail_images[self._tail_direction],
+                     tail_x, tail_y, left, top)
+        blit_wrapped(screen, self.rect, engine.grid_size, self._head_images[engine.direction],
+                     head_x, head_y, left, top)
+        screen.set_clip(clip)
+
+
+class ArenaView:
+    """Draws the part of a multiplayer arena around the head of one player's snake, looking only at the cells
+     inside the view like WorldView. Each player's snake has its own body color."""
+
+    def __init__(self, mirror: "ArenaMirror", player: int, rect: pg.rect.Rect) -> None:
+        cols, rows = mirror.grid_size
+        if cols * sprites.TILE_SIZE[0] < rect.width or rows * sprites.TILE_SIZE[1] < rect.height:
+            raise ValueError("The board must be at least as large as the view.")
+        self.mirror = mirror
+        self.player = player
+        self.rect = rect
+        self.columns = math.ceil(rect.width / sprites.TILE_SIZE[0]) + 1
+        self.rows = math.ceil(rect.height / sprites.TILE_SIZE[1]) + 1
+        self._background = tile_background(rect.size)
+        self._body_images: dict[int, pg.surface.Surface] = {}
+        self._head_images = registry.orientations("head.png", sprites.TILE_SIZE)
+        self._food_image = registry.image("food.png", sprites.FOOD_SIZE)
+        # board cell the view is centered on, kept while the player's snake is dead
+        self._center = cols // 2, rows // 2
+
+    def _body_image(self, player: int) -> pg.surface.Surface:
+        """Returns the body tile of a player's snake, the snake color for the viewing player."""
+        if (image := self._body_images.get(player)) is None:
+            image = self._body_images[player] = pg.Surface(sprites.TILE_SIZE)
+            if player == self.player:
+                image.fill(sprites.SNAKE_COLOR)
+            else:
+                color = pg.Color(0)
+                color.hsva = (player * 47 % 360, 70, 90, 100)  # hues far apart for consecutive player ids
+                image.fill(color)
+        return image
+
+    def draw(self, screen: pg.surface.Surface) -> None:
+        """Draws the board around the head of the player's snake, and the score of the player."""
+        mirror = self.mirror
+        cols, rows = mirror.grid_size
+        tile_w, tile_h = sprites.TILE_SIZE
+        snake = mirror.snakes.get(self.player)
+        if snake is not None and snake.alive:
+            self._center = snake.body[0]
+        left = self._center[0] * tile_w + tile_w // 2 - self.rect.width // 2
+        top = self._center[1] * tile_h + tile_h // 2 - self.rect.height // 2
+        first_col, offset_x = divmod(left, tile_w)
+        first_row, offset_y = divmod(top, tile_h)
+
+        clip = screen.get_clip()
+        screen.set_clip(self.rect)
+        screen.blit(self._background, self.rect,
+                    pg.Rect(left % (2 * tile_w), top % (2 * tile_h), self.rect.width, self.rect.height))
+        owners = mirror.owners
+        blits = []
+        for row in range(self.rows):
+            y = (first_row + row) % rows
+            screen_y = self.rect.y + row * tile_h - offset_y
+            for column in range(self.columns):
+                if owner := owners[y * cols + (first_col + column) % cols]:
+                    blits.append((self._body_image(owner), (self.rect.x + column * tile_w - offset_x, screen_y)))
+        screen.blits(blits, doreturn=False)
+
+        for x, y in mirror.food:
+            blit_wrapped(screen, self.rect, mirror.grid_size, self._food_image, x * tile_w, y * tile_h, left, top)
+        for other in mirror.snakes.values():
+            if other.alive:
+                x, y = other.body[0]
+                blit_wrapped(screen, self.rect, mirror.grid_size, self._head_images[other.direction],
+                             x * tile_w, y * tile_h, left, top)
+        screen.set_clip(clip)
+
+        text = f"Score: {snake.score if snake is not None else 0}   Players: {len(mirror.snakes)}"
+        if snake is not None and not snake.alive:
+            text += "   Respawning..."
+        screen.blit(registry.text(sprites.FONT, 24, text, "white"), (self.rect.x + 8, self.rect.y + 8))